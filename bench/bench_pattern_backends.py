@@ -0,0 +1,33 @@
+"""
+对比 re 与 BytecodePattern 两种特征码后端的耗时和结果，仅输出供参考
+
+python bench/bench_pattern_backends.py <pe 文件> <特征码>...
+"""
+import sys
+import time
+
+from nylib.pattern_v2 import Pattern, BytecodePattern, StaticPatternSearcher, compile_pattern, is_executable_section
+from nylib.utils import fmt_sec
+
+
+def bench_backends(pe, *patterns: str, base_address=0):
+    searcher = StaticPatternSearcher(pe, base_address, zero_copy=True, section_filter=is_executable_section)
+    res = {}
+    try:
+        for s in patterns:
+            timings = []
+            results = []
+            for pattern_cls in (Pattern, BytecodePattern):
+                pattern = compile_pattern(s, pattern_cls)
+                start = time.perf_counter()
+                results.append(list(searcher.search(pattern)))
+                timings.append(time.perf_counter() - start)
+            res[s] = *timings, results[0] == results[1]
+            print(f're {fmt_sec(timings[0]):>10} | bytecode {fmt_sec(timings[1]):>10} | {len(results[0]):>6} hits {"" if res[s][2] else "MISMATCH "}| {s}')
+    finally:
+        searcher.close()
+    return res
+
+
+if __name__ == '__main__':
+    bench_backends(sys.argv[1], *sys.argv[2:])
@@ -1,10 +1,25 @@
 import ctypes
 import dataclasses
+import functools
+import struct
 import typing
 
 _T = typing.TypeVar('_T')
 
 
+@functools.lru_cache(maxsize=None)
+def _struct_of(_type) -> struct.Struct | None:
+    # ctypes 基础类型 / struct 格式字串对应的 struct.Struct，其他类型返回 None
+    if isinstance(_type, str):
+        return struct.Struct(_type)
+    if isinstance(fmt := getattr(_type, '_type_', None), str) and issubclass(_type, ctypes._SimpleCData):
+        try:
+            return struct.Struct(fmt)
+        except struct.error:
+            return None
+    return None
+
+
 @dataclasses.dataclass
 class ModuleBase:
     file_path: str
@@ -12,7 +27,18 @@ class ModuleBase:
     image_size: int
 
 
+@dataclasses.dataclass
+class MemoryRegion:
+    address: int
+    size: int
+    file_path: str = ''
+    protect: str = 'r'  # r/w/x 的组合
+    type: str = ''  # image / mapped / private
+
+
 class DriverBase:
+    page_size = 0x1000
+    scatter_gap = 0x1000  # read_scatter 合并读取时允许的最大间隙
 
     def read(self, _type: typing.Type[_T], address: int, ) -> _T:
         """
@@ -28,11 +54,14 @@ class DriverBase:
         return self.read(ctypes.c_char * max_size, address).value.decode(encoding=encoding, errors=errors)
 
     def read_string_safe(self, address: int, max_size: int = 64, encoding: str = 'utf-8', errors='ignore') -> str:
+        # 逐页读取（同一页内不会部分不可读），遇到 0 即停止，不会读到字串所在页之后
         buffer = bytearray()
-        i = 0
-        while i < max_size and (n := self.read_uint8(address + i)):
-            buffer.append(n)
-            i += 1
+        while (i := len(buffer)) < max_size:
+            chunk = self.read_bytes(address + i, min(self.page_size - (address + i) % self.page_size, max_size - i))
+            if (end := chunk.find(0)) >= 0:
+                buffer += chunk[:end]
+                break
+            buffer += chunk
         return buffer.decode(encoding=encoding, errors=errors)
 
     read_string = read_string_fast
@@ -40,6 +69,79 @@ class DriverBase:
     def read_bytes(self, address: int, size: int) -> bytes:
         return self.read(ctypes.c_char * size, address)[:]
 
+    def read_into(self, address: int, buffer) -> None:
+        """
+        从目标读取内存到可写的 buffer（bytearray, memoryview 等）
+        """
+        view = memoryview(buffer).cast('B')
+        view[:] = self.read_bytes(address, len(view))
+
+    def read_blocks(self, blocks: typing.Sequence[tuple[int, int]]) -> list[bytes | bytearray | None]:
+        """
+        读取多块内存，读取失败的块为 None，支持向量 IO 的驱动可覆盖此方法
+
+        :param blocks: [(地址, 大小)]
+        """
+        res = []
+        for address, size in blocks:
+            try:
+                res.append(self.read_bytes(address, size))
+            except Exception:
+                res.append(None)
+        return res
+
+    def _scatter(self, spans: typing.Sequence[tuple[int, int]]) -> list[tuple[bytes | bytearray, int] | None]:
+        # 相近的地址合并为按页对齐的块一次读取，返回每段所在的 (块数据, 偏移)
+        mask = self.page_size - 1
+        blocks = []  # [[起始, 结束, [段序号]]]
+        for i in sorted(range(len(spans)), key=lambda i: spans[i][0]):
+            address, size = spans[i]
+            start = address & ~mask
+            end = (address + size + mask) & ~mask
+            if blocks and start <= blocks[-1][1] + self.scatter_gap:
+                block = blocks[-1]
+                block[1] = max(block[1], end)
+                block[2].append(i)
+            else:
+                blocks.append([start, end, [i]])
+        res = [None] * len(spans)
+        for (start, end, idx), data in zip(blocks, self.read_blocks([(start, end - start) for start, end, _ in blocks])):
+            if data is None:  # 块内有不可读的页，退回逐段读取
+                for i, data in zip(idx, self.read_blocks([spans[i] for i in idx])):
+                    if data is not None: res[i] = data, 0
+            else:
+                for i in idx: res[i] = data, spans[i][0] - start
+        return res
+
+    def read_scatter(self, spans: typing.Sequence[tuple[int, int]]) -> list[memoryview | None]:
+        """
+        读取多段内存，相近的地址合并为按页对齐的整块读取
+
+        :param spans: [(地址, 大小)]
+        :return: 与 spans 对应的数据，读取失败的段为 None
+        """
+        return [None if r is None else memoryview(r[0])[r[1]:r[1] + size] for r, (_, size) in zip(self._scatter(spans), spans)]
+
+    def read_many(self, items: typing.Sequence[tuple[typing.Type[_T] | str, int]]) -> list[_T | typing.Any | None]:
+        """
+        批量读取，相近的地址合并读取后以 struct.unpack_from 解码
+
+        :param items: [(数据类型, 内存地址)]，数据类型为 ctypes 类型或 struct 格式字串
+        :return: ctypes 基础类型及单值格式字串返回值，其余 ctypes 类型返回实例，多值格式字串返回元组；读取失败为 None
+        """
+        structs = [_struct_of(_type) for _type, _ in items]
+        spans = [(address, s.size if s is not None else ctypes.sizeof(_type)) for s, (_type, address) in zip(structs, items)]
+        res = []
+        for s, (_type, _), r in zip(structs, items, self._scatter(spans)):
+            if r is None:
+                res.append(None)
+            elif s is None:
+                res.append(_type.from_buffer_copy(r[0], r[1]))
+            else:
+                v = s.unpack_from(r[0], r[1])
+                res.append(v[0] if len(v) == 1 else v)
+        return res
+
     def read_uint8(self, address: int) -> int:
         return self.read(ctypes.c_uint8, address).value
 
@@ -111,6 +213,12 @@ class DriverBase:
         """
         raise NotImplementedError
 
+    def iter_memory_region(self) -> typing.Iterable[MemoryRegion]:
+        """
+        按地址顺序遍历进程中可读的内存区域
+        """
+        raise NotImplementedError
+
     def base_module(self) -> ModuleBase:
         """
         进程的执行档
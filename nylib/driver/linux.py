@@ -0,0 +1,137 @@
+import ctypes
+import os
+import typing
+
+from . import DriverBase, ModuleBase, MemoryRegion, _T
+
+
+class iovec(ctypes.Structure):
+    _fields_ = [
+        ('iov_base', ctypes.c_void_p),
+        ('iov_len', ctypes.c_size_t),
+    ]
+
+
+_libc = ctypes.CDLL(None, use_errno=True)
+process_vm_readv = _libc.process_vm_readv
+process_vm_readv.argtypes = [ctypes.c_int, ctypes.POINTER(iovec), ctypes.c_ulong, ctypes.POINTER(iovec), ctypes.c_ulong, ctypes.c_ulong]
+process_vm_readv.restype = ctypes.c_ssize_t
+IOV_MAX = 1024
+
+
+def iter_proc_maps(pid: int | str = 'self') -> typing.Iterable[tuple[int, int, str, str]]:
+    """
+    解析 /proc/<pid>/maps
+
+    :return: (起始地址, 结束地址, 权限, 映射路径)
+    """
+    with open(f'/proc/{pid}/maps', encoding='utf-8', errors='surrogateescape') as f:
+        for line in f:
+            parts = line.split(maxsplit=5)
+            start, end = parts[0].split('-')
+            yield int(start, 16), int(end, 16), parts[1], parts[5].rstrip('\n') if len(parts) > 5 else ''
+
+
+class LinuxDriver(DriverBase):
+    unreadable_maps = {'[vvar]', '[vvar_vclock]', '[vsyscall]'}  # 这些映射无法通过 /proc/<pid>/mem 读取
+
+    def __init__(self, pid: int, writable=False):
+        self.pid = pid
+        self.fd = os.open(f'/proc/{pid}/mem', os.O_RDWR if writable else os.O_RDONLY)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def read_into(self, address: int, buffer) -> None:
+        """
+        从目标读取内存到 buffer，读不满时抛出 OSError
+        """
+        view = memoryview(buffer).cast('B')
+        done = 0
+        while done < len(view):
+            if not (n := os.preadv(self.fd, [view[done:]], address + done)):
+                raise OSError(f'cannot read {len(view) - done:#x} bytes at {address + done:#x} of process {self.pid}')
+            done += n
+
+    def read_blocks(self, blocks: typing.Sequence[tuple[int, int]]) -> list[bytearray | None]:
+        # process_vm_readv 一次调用读取最多 IOV_MAX 块，遇到不可读的块时从其后继续
+        res = [None] * len(blocks)
+        i = 0
+        while i < len(blocks):
+            batch = blocks[i:i + IOV_MAX]
+            buffers = [bytearray(size) for _, size in batch]
+            local = (iovec * len(batch))(*((ctypes.addressof((ctypes.c_char * len(b)).from_buffer(b)), len(b)) for b in buffers))
+            remote = (iovec * len(batch))(*(iovec(address, size) for address, size in batch))
+            if (n := process_vm_readv(self.pid, local, len(batch), remote, len(batch), 0)) < 0:
+                i += 1  # 第一块不可读
+                continue
+            for buffer in buffers:
+                if n < len(buffer): break
+                res[i] = buffer
+                n -= len(buffer)
+                i += 1
+            else:
+                continue
+            i += 1  # 部分读取只会在块的边界停止，跳过读取失败的这一块
+        return res
+
+    def read(self, _type: typing.Type[_T], address: int) -> _T:
+        res = _type()
+        self.read_into(address, res)
+        return res
+
+    def read_bytes(self, address: int, size: int) -> bytearray:
+        buf = bytearray(size)
+        self.read_into(address, buf)
+        return buf
+
+    def write(self, address: int, data) -> None:
+        view = memoryview(data).cast('B')
+        done = 0
+        while done < len(view):
+            if not (n := os.pwrite(self.fd, view[done:], address + done)):
+                raise OSError(f'cannot write {len(view) - done:#x} bytes at {address + done:#x} of process {self.pid}')
+            done += n
+
+    def write_bytes(self, address: int, data: bytes):
+        self.write(address, data)
+
+    def iter_memory_region(self) -> typing.Iterable[MemoryRegion]:
+        maps = list(iter_proc_maps(self.pid))
+        # 有可执行映射的文件视作 image（可执行档、so），其余文件映射视作 mapped
+        images = {path for _, _, perms, path in maps if perms[2] == 'x' and path.startswith('/')}
+        for start, end, perms, path in maps:
+            if perms[0] != 'r' or path in self.unreadable_maps: continue
+            if path in images:
+                region_type = 'image'
+            elif path.startswith('/') or perms[3] == 's':
+                region_type = 'mapped'
+            else:
+                region_type = 'private'
+            yield MemoryRegion(start, end - start, path, perms[:3].replace('-', ''), region_type)
+
+    def iter_modules(self) -> typing.Iterable[ModuleBase]:
+        modules = {}
+        for start, end, perms, path in iter_proc_maps(self.pid):
+            if not path.startswith('/'): continue
+            if (module := modules.get(path)) is None:
+                modules[path] = ModuleBase(path, start, end - start)
+            else:
+                module.image_size = max(module.image_size, end - module.image_base)
+        return modules.values()
+
+    def base_module(self) -> ModuleBase:
+        exe = os.readlink(f'/proc/{self.pid}/exe')
+        modules = list(self.iter_modules())
+        for module in modules:
+            if module.file_path == exe:
+                return module
+        return modules[0]
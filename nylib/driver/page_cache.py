@@ -0,0 +1,127 @@
+import contextlib
+import threading
+import typing
+
+from . import DriverBase, ModuleBase, MemoryRegion, _T
+
+
+class PageCacheDriver(DriverBase):
+    """
+    为任意 DriverBase 加一层页缓存
+
+    frame() 内的读取以页为单位从目标读取并缓存，同一 frame 内重复读取同一页不再访问目标；
+    frame 结束（generation 递增）后缓存失效；frame 外的读取直接透传。写入会使相关页失效
+    """
+
+    def __init__(self, driver: DriverBase, page_size: int = None):
+        self.driver = driver
+        self.page_size = page_size or driver.page_size
+        self.generation = 0
+        self.pages: typing.Dict[int, bytes | bytearray | None] = {}  # 页地址 -> 数据，None 为不可读
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    @property
+    def in_frame(self):
+        return self._depth > 0
+
+    def new_generation(self):
+        with self._lock:
+            self.generation += 1
+            self.pages.clear()
+
+    @contextlib.contextmanager
+    def frame(self):
+        """
+        缓存作用域，可嵌套，最外层进入和退出时都会使缓存失效
+        """
+        with self._lock:
+            if not self._depth: self.new_generation()
+            self._depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._depth -= 1
+                if not self._depth: self.new_generation()
+
+    def _fetch_pages(self, first: int, last: int):
+        # 读取 [first, last] 中尚未缓存的页，连续的缺页合并为一块
+        page_size = self.page_size
+        blocks = []
+        for page in range(first, last + 1, page_size):
+            if page in self.pages: continue
+            if blocks and blocks[-1][0] + blocks[-1][1] == page:
+                blocks[-1] = (blocks[-1][0], blocks[-1][1] + page_size)
+            else:
+                blocks.append((page, page_size))
+        if not blocks: return
+        for (address, size), data in zip(blocks, self.driver.read_blocks(blocks)):
+            if data is None and size > page_size:  # 块内有不可读的页，逐页重试
+                for page, page_data in zip(range(address, address + size, page_size), self.driver.read_blocks([(p, page_size) for p in range(address, address + size, page_size)])):
+                    self.pages[page] = page_data
+            else:
+                for off in range(0, size, page_size):
+                    self.pages[address + off] = None if data is None else data[off:off + page_size]
+
+    def read_into(self, address: int, buffer) -> None:
+        if not self._depth: return self.driver.read_into(address, buffer)
+        view = memoryview(buffer).cast('B')
+        if not (size := len(view)): return
+        mask = self.page_size - 1
+        with self._lock:
+            self._fetch_pages(address & ~mask, (address + size - 1) & ~mask)
+            done = 0
+            while done < size:
+                page = (address + done) & ~mask
+                if (data := self.pages[page]) is None:
+                    raise OSError(f'cannot read page {page:#x}')
+                off = address + done - page
+                n = min(self.page_size - off, size - done)
+                view[done:done + n] = data[off:off + n]
+                done += n
+
+    def read(self, _type: typing.Type[_T], address: int) -> _T:
+        if not self._depth: return self.driver.read(_type, address)
+        res = _type()
+        self.read_into(address, res)
+        return res
+
+    def read_bytes(self, address: int, size: int) -> bytes | bytearray:
+        if not self._depth: return self.driver.read_bytes(address, size)
+        res = bytearray(size)
+        self.read_into(address, res)
+        return res
+
+    def read_blocks(self, blocks: typing.Sequence[tuple[int, int]]) -> list[bytes | bytearray | None]:
+        if not self._depth: return self.driver.read_blocks(blocks)
+        return super().read_blocks(blocks)
+
+    def invalidate(self, address: int, size: int):
+        mask = self.page_size - 1
+        with self._lock:
+            for page in range(address & ~mask, address + size, self.page_size):
+                self.pages.pop(page, None)
+
+    def write(self, address: int, data) -> None:
+        self.driver.write(address, data)
+        self.invalidate(address, len(memoryview(data).cast('B')))
+
+    def write_bytes(self, address: int, data: bytes):
+        self.driver.write_bytes(address, data)
+        self.invalidate(address, len(data))
+
+    def malloc(self, size: int) -> int:
+        return self.driver.malloc(size)
+
+    def free(self, address: int):
+        self.driver.free(address)
+
+    def iter_modules(self) -> typing.Iterable[ModuleBase]:
+        return self.driver.iter_modules()
+
+    def iter_memory_region(self) -> typing.Iterable[MemoryRegion]:
+        return self.driver.iter_memory_region()
+
+    def base_module(self) -> ModuleBase:
+        return self.driver.base_module()
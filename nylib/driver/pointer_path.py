@@ -0,0 +1,70 @@
+import array
+import contextlib
+import ctypes
+import typing
+
+from . import DriverBase
+
+
+class PointerPathResolver:
+    """
+    批量解析多级指针路径
+
+    路径 (base, o1, o2, ..., on) 表示 [[base + o1] + o2] ... + on，即从 base + o1 开始，每一级读取指针后加上下一个偏移。
+    所有路径按公共前缀合并，每一级只发起一次 read_many；frame() 内（或 driver 为 PageCacheDriver 且处于其 frame 内时）
+    前缀的解析结果会被记住，供之后的 resolve 复用
+    """
+
+    def __init__(self, driver: 'DriverBase | int', ptr_size: int = ctypes.sizeof(ctypes.c_void_p)):
+        """
+        :param driver: DriverBase，或 win32 进程句柄
+        :param ptr_size: 目标进程的指针大小
+        """
+        if not isinstance(driver, DriverBase):
+            from .win32 import Win32Driver
+            driver = Win32Driver(driver)
+        self.driver = driver
+        self.ptr_type = {4: ctypes.c_uint32, 8: ctypes.c_uint64}[ptr_size]
+        self.memo: typing.Dict[tuple[int, ...], int] = {}
+        self._depth = 0
+        self._memo_generation = None
+
+    @contextlib.contextmanager
+    def frame(self):
+        if not self._depth: self.memo.clear()
+        self._depth += 1
+        try:
+            yield self
+        finally:
+            self._depth -= 1
+            if not self._depth: self.memo.clear()
+
+    def _current_memo(self) -> dict:
+        if self._depth: return self.memo
+        if getattr(self.driver, 'in_frame', False):
+            if self._memo_generation != (generation := self.driver.generation):
+                self.memo.clear()
+                self._memo_generation = generation
+            return self.memo
+        return {}
+
+    def resolve(self, paths: typing.Iterable[typing.Sequence[int]]) -> array.array:
+        """
+        :return: 与 paths 对应的最终地址，中途读到空指针或读取失败为 0
+        """
+        paths = [tuple(p) for p in paths]
+        memo = self._current_memo()
+        for p in paths:
+            if len(p) >= 2 and (key := p[:2]) not in memo:
+                memo[key] = p[0] + p[1]
+        for n in range(3, max(map(len, paths), default=0) + 1):
+            need = {p[:n] for p in paths if len(p) >= n} - memo.keys()
+            if not need: continue
+            parents = list({memo[k[:-1]] for k in need} - {0})
+            values = dict(zip(parents, self.driver.read_many([(self.ptr_type, a) for a in parents])))
+            for k in need:
+                memo[k] = v + k[-1] if (v := values.get(memo[k[:-1]])) else 0
+        return array.array('Q', (memo[p] if len(p) >= 2 else p[0] if p else 0 for p in paths))
+
+    def resolve_one(self, *path: int) -> int:
+        return self.resolve([path])[0]
@@ -0,0 +1,57 @@
+import ctypes
+import typing
+
+from . import DriverBase, ModuleBase, MemoryRegion, _T
+from ..utils.win32 import memory, process
+from ..utils.win32.winapi import structure, psapi
+
+
+_protect_map = {
+    structure.MEMORY_PROTECTION.PAGE_READONLY: 'r',
+    structure.MEMORY_PROTECTION.PAGE_READWRITE: 'rw',
+    structure.MEMORY_PROTECTION.PAGE_WRITECOPY: 'rw',
+    structure.MEMORY_PROTECTION.PAGE_EXECUTE: 'x',
+    structure.MEMORY_PROTECTION.PAGE_EXECUTE_READ: 'rx',
+    structure.MEMORY_PROTECTION.PAGE_EXECUTE_READWRITE: 'rwx',
+    structure.MEMORY_PROTECTION.PAGE_EXECUTE_WRITECOPY: 'rwx',
+}
+_type_map = {
+    structure.MEMORY_TYPES.MEM_IMAGE: 'image',
+    structure.MEMORY_TYPES.MEM_MAPPED: 'mapped',
+    structure.MEMORY_TYPES.MEM_PRIVATE: 'private',
+}
+
+
+class Win32Driver(DriverBase):
+    def __init__(self, handle):
+        self.handle = handle
+
+    def read(self, _type: typing.Type[_T], address: int) -> _T:
+        return memory.read_memory(self.handle, _type, address)
+
+    def read_bytes(self, address: int, size: int) -> bytearray:
+        return memory.read_bytes(self.handle, address, size)
+
+    def write(self, address: int, data) -> None:
+        memory.write_memory(self.handle, address, data)
+
+    def write_bytes(self, address: int, data: bytes):
+        memory.write_bytes(self.handle, address, data)
+
+    def malloc(self, size: int) -> int:
+        return memory.alloc(self.handle, size)
+
+    def free(self, address: int):
+        memory.free(self.handle, address)
+
+    def iter_memory_region(self) -> typing.Iterable[MemoryRegion]:
+        for mbi in memory.iter_memory_region(self.handle):
+            if mbi.State != structure.MEMORY_STATE.MEM_COMMIT: continue
+            if mbi.Protect & structure.MEMORY_PROTECTION.PAGE_GUARD or 'r' not in (protect := _protect_map.get(mbi.Protect & 0xff, '')): continue
+            yield MemoryRegion(mbi.BaseAddress, mbi.RegionSize, protect=protect, type=_type_map.get(mbi.Type, ''))
+
+    def iter_modules(self) -> typing.Iterable[ModuleBase]:
+        for module in process.enum_process_module(self.handle):
+            file_path = ctypes.create_string_buffer(0x400)
+            psapi.GetModuleFileNameExA(self.handle, ctypes.c_void_p(module.lpBaseOfDll), file_path, ctypes.sizeof(file_path))
+            yield ModuleBase(file_path.value.decode(errors='ignore'), module.lpBaseOfDll, module.SizeOfImage)
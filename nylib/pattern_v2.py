@@ -10,11 +10,27 @@
 # <xx xx xx xx> 储存的分组
 # <* * * *: yy yy yy yy> 对分组数据二级匹配
 # <* * * *: yy yy yy yy <* * * *:zz zz zz zz>> 对分组数据多级匹配，仅适用于跳转
+import bisect
+import concurrent.futures
+import dataclasses
+import hashlib
 import io
+import json
+import marshal
+import os
+import pathlib
 import re
+import threading
 import typing
+from multiprocessing import shared_memory
 from . import pefile
-from .utils.win32 import memory
+from .driver import DriverBase
+from .utils import LRU, SizedLRU
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 fl_is_ref = 1 << 0
 fl_is_byes = 1 << 1
@@ -84,7 +100,7 @@ def take_unk(pattern: str, i: int, regex_pattern: bytearray):
     return start_unk, i
 
 
-def _compile_pattern(pattern: str, i=0, ret_at=None):
+def _compile_pattern(pattern: str, i=0, ret_at=None, pattern_cls: 'typing.Type[Pattern]' = None):
     _i = i
     regex_pattern = bytearray()
     sub_matches = []
@@ -131,7 +147,7 @@ def _compile_pattern(pattern: str, i=0, ret_at=None):
                             i += 1
                             break
                         case ':':
-                            sub_pattern, i = _compile_pattern(pattern, i + 1, ret_at=')')
+                            sub_pattern, i = _compile_pattern(pattern, i + 1, ret_at=')', pattern_cls=pattern_cls)
                             assert pattern[i] == ')', f'Expected ) get {pattern[i]} at {i} in pattern {pattern!r}'
                             regex_pattern.append(41)
                             i += 1
@@ -158,7 +174,7 @@ def _compile_pattern(pattern: str, i=0, ret_at=None):
                             i += 1
                             break
                         case ':':
-                            sub_pattern, i = _compile_pattern(pattern, i + 1, ret_at='>')
+                            sub_pattern, i = _compile_pattern(pattern, i + 1, ret_at='>', pattern_cls=pattern_cls)
                             assert pattern[i] == '>', f'Expected > get {pattern[i]} at {i} in pattern {pattern!r}'
                             regex_pattern.append(41)
                             i += 1
@@ -192,19 +208,115 @@ def _compile_pattern(pattern: str, i=0, ret_at=None):
         regex = re.compile(bytes(regex_pattern), re.DOTALL)
     except re.error as e:
         raise ValueError(f'{e}: ({pattern!r}, {_i}, {ret_at!r}) -> {bytes(regex_pattern)}')
-    return Pattern(regex, sub_matches, group_flags, pattern), i
+    return (pattern_cls or Pattern)(regex, sub_matches, group_flags, pattern), i
+
+
+def compile_pattern(pattern: str, pattern_cls: 'typing.Type[Pattern]' = None):
+    """
+    :param pattern_cls: 匹配后端，默认 Pattern（re），可选 BytecodePattern
+    """
+    return _compile_pattern(pattern, pattern_cls=pattern_cls)[0]
+
+
+def iter_regex_atoms(regex_pattern: bytes):
+    """
+    遍历 _compile_pattern 生成的正则，依次产出 (kind, value, min_cnt, max_cnt)
+
+    kind: 'byte' 固定字节 / 'class' 字节集合 / 'any' 任意字节 / '(' ')' 分组边界
+    """
+    i = 0
+    size = len(regex_pattern)
+    while i < size:
+        b = regex_pattern[i]
+        i += 1
+        if b == 40 or b == 41:  # ( )
+            yield chr(b), None, 1, 1
+            continue
+        if b == 92:  # \
+            kind, value = 'byte', regex_pattern[i]
+            i += 1
+        elif b == 46:  # .
+            kind, value = 'any', None
+        elif b == 91:  # [
+            kind, value = 'class', set()
+            last = None
+            while (b := regex_pattern[i]) != 93:  # ]
+                i += 1
+                if b == 45:  # -
+                    b = regex_pattern[i]
+                    i += 1
+                    if b == 92:
+                        b = regex_pattern[i]
+                        i += 1
+                    value.update(range(last, b + 1))
+                    continue
+                if b == 92:
+                    b = regex_pattern[i]
+                    i += 1
+                value.add(b)
+                last = b
+            i += 1
+        else:
+            kind, value = 'byte', b
+        n = m = 1
+        if i < size and regex_pattern[i] == 123:  # {
+            j = regex_pattern.index(125, i)  # }
+            n, _, m = regex_pattern[i + 1:j].partition(b',')
+            n = int(n)
+            m = int(m) if m else n
+            i = j + 1
+        yield kind, value, n, m
+
 
+min_anchor_size = 2
 
-def compile_pattern(pattern: str):
-    return _compile_pattern(pattern)[0]
+
+def find_literal_anchor(regex_pattern: bytes) -> tuple[int, bytes]:
+    """
+    找出正则中距开头偏移固定的最长连续字节串
+
+    :return: (偏移, 字节串)，找不到则为 (0, b'')
+    """
+    best_off, best = 0, b''
+    off = run_off = 0
+    run = bytearray()
+    for kind, value, n, m in iter_regex_atoms(regex_pattern):
+        if kind in '()': continue
+        if kind == 'byte':
+            if not run: run_off = off
+            run.extend(bytes((value,)) * n)
+            if n == m:
+                off += n
+                continue
+        if len(run) > len(best): best_off, best = run_off, bytes(run)
+        run.clear()
+        if n != m: break  # 之后的偏移不固定
+        off += n
+    if len(run) > len(best): best_off, best = run_off, bytes(run)
+    if len(best) < min_anchor_size: return 0, b''
+    return best_off, best
+
+
+def iter_find(data, sub: bytes, start=0, end=None):
+    # 以字面正则查找，可直接作用于 memoryview/mmap 而无需复制
+    finder = re.compile(re.escape(sub))
+    if end is None: end = len(data)
+    while match := finder.search(data, start, end):
+        yield (i := match.start())
+        start = i + 1
 
 
 class Pattern:
+    np_block_size = 0x1000000
+
     def __init__(self, regex: re.Pattern, sub_matches: 'typing.List[None | Pattern]', group_flags, pattern: str):
         self.regex = regex
         self.sub_matches = sub_matches
         self.group_flags = group_flags
         self.pattern = pattern
+        self.anchor_offset, self.anchor = find_literal_anchor(regex.pattern)
+        self.max_size = sum(m for kind, _, _, m in iter_regex_atoms(regex.pattern) if kind not in '()')
+        self.mask_bytes = self._calc_mask_bytes() if all(sub is None for sub in sub_matches) else []
         self.res_is_ref = []
         for i, (sub, flag) in enumerate(zip(sub_matches, group_flags)):
             if flag & fl_store:
@@ -212,12 +324,61 @@ class Pattern:
             if sub is not None:
                 self.res_is_ref.extend(sub.res_is_ref)
 
-    def finditer(self, _data: bytes | bytearray | memoryview, ref_base=0):
+    def _calc_mask_bytes(self) -> list[tuple[int, int]]:
+        # 定长且无二级匹配时，所有固定字节的 [(偏移, 字节)]，用于 numpy 掩码过滤
+        res = []
+        off = 0
+        for kind, value, n, m in iter_regex_atoms(self.regex.pattern):
+            if kind in '()': continue
+            if n != m: return []
+            if kind == 'byte': res.extend((off + i, value) for i in range(n))
+            off += n
+        return res
+
+    def _iter_np_candidates(self, _data, pos, endpos):
+        # 以移位视图逐个比较固定字节并求与，候选变少后改为只在候选处比较
+        arr = np.frombuffer(_data, np.uint8)
+        (off0, b0), (off1, b1), *rest = self.mask_bytes
+        stop = endpos - self.max_size + 1
+        for start in range(pos, stop, self.np_block_size):
+            end = min(start + self.np_block_size, stop)
+            mask = arr[start + off0:end + off0] == b0
+            mask &= arr[start + off1:end + off1] == b1
+            idx = np.flatnonzero(mask) + start
+            for off, b in rest:
+                if not len(idx): break
+                idx = idx[arr[idx + off] == b]
+            yield from idx.tolist()
+
+    def finditer(self, _data: bytes | bytearray | memoryview, ref_base=0, pos=0, endpos=None):
+        for start, end, res in self._iter_match(_data, ref_base, pos, endpos):
+            if res is not None:
+                yield start, res
+
+    def _iter_match(self, _data: bytes | bytearray | memoryview, ref_base=0, pos=0, endpos=None):
+        # 产出 (start, end, res)，子匹配失败时 res 为 None（用于分块合并时对齐扫描位置）
         data = _data if isinstance(_data, memoryview) else memoryview(_data)
-        for match in self.regex.finditer(data):
+        if endpos is None: endpos = len(data)
+        if not self.anchor and np is not None and len(self.mask_bytes) >= 2:  # xx ? xx 形式的掩码特征
+            last_end = pos
+            for start in self._iter_np_candidates(_data, pos, endpos):
+                if start < last_end or not (match := self.regex.match(data, start, endpos)): continue
+                last_end = match.end(0)
+                res = []
+                yield start, last_end, res if self._parse_match(data, match, res, ref_base) else None
+            return
+        if not self.anchor_offset:  # 无锚点，或锚点即开头（正则引擎自身会按字面前缀跳跃）
+            for match in self.regex.finditer(data, pos, endpos):
+                res = []
+                yield match.start(0), match.end(0), res if self._parse_match(data, match, res, ref_base) else None
+            return
+        last_end = pos
+        for i in iter_find(_data, self.anchor, pos + self.anchor_offset, endpos):
+            if (start := i - self.anchor_offset) < last_end: continue
+            if not (match := self.regex.match(data, start, endpos)): continue
+            last_end = match.end(0)
             res = []
-            if self._parse_match(data, match, res, ref_base):
-                yield match.start(0), res
+            yield start, last_end, res if self._parse_match(data, match, res, ref_base) else None
 
     def _parse_match(self, data: memoryview, match: re.Match, res: list, ref_base=0):
         for i, (sub_match, flag) in enumerate(zip(self.sub_matches, self.group_flags)):
@@ -261,6 +422,197 @@ class Pattern:
         return s.getvalue().rstrip()
 
 
+OP_SAVE = 0  # arg: 记录位置的槽
+OP_LIT = 1  # arg: 连续固定字节
+OP_BYTE = 2  # arg: 单字节，重复 n-m 次
+OP_RANGE = 3  # arg: (lo, hi)，重复 n-m 次
+OP_MASK = 4  # arg: 256 字节表，非零为可匹配，重复 n-m 次
+OP_SKIP = 5  # 任意字节，重复 n-m 次
+
+
+def compile_bytecode(regex_pattern: bytes) -> list[tuple[int, typing.Any, int, int]]:
+    """
+    将 _compile_pattern 生成的正则转为扁平指令表 [(op, arg, n, m), ...]
+    """
+    program = []
+    group = 0
+    group_stack = []
+    for kind, value, n, m in iter_regex_atoms(regex_pattern):
+        if kind not in '()' and m == 0: continue  # xx{0} / ?{0} 不匹配任何字节
+        if kind == '(':
+            group += 1
+            group_stack.append(group)
+            program.append((OP_SAVE, group * 2, 1, 1))
+        elif kind == ')':
+            program.append((OP_SAVE, group_stack.pop() * 2 + 1, 1, 1))
+        elif kind == 'byte':
+            if n != m:
+                program.append((OP_BYTE, value, n, m))
+            elif program and program[-1][0] == OP_LIT:
+                program[-1] = (OP_LIT, program[-1][1] + bytes((value,)) * n, 1, 1)
+            else:
+                program.append((OP_LIT, bytes((value,)) * n, 1, 1))
+        elif kind == 'class':
+            lo, hi = min(value), max(value)
+            if len(value) == hi - lo + 1:
+                program.append((OP_RANGE, (lo, hi), n, m))
+            else:
+                program.append((OP_MASK, bytes(i in value for i in range(256)), n, m))
+        else:
+            program.append((OP_SKIP, None, n, m))
+    return program
+
+
+def run_bytecode(program: list, data, pos: int, endpos: int, caps: list, pc=0, fail: set = None) -> int:
+    """
+    从 pos 开始执行指令表，与 re 相同按贪婪优先回溯；失败的 (pc, pos) 会被记录，避免指数级回溯
+
+    :return: 匹配结束位置，失败为 -1
+    """
+    size = len(program)
+    while pc < size:
+        op, arg, n, m = program[pc]
+        if op == OP_SAVE:
+            caps[arg] = pos
+            pc += 1
+            continue
+        if op == OP_LIT:
+            if (end := pos + len(arg)) > endpos or data[pos:end] != arg: return -1
+            pos = end
+            pc += 1
+            continue
+        k = 0
+        lim = min(m, endpos - pos)
+        if op == OP_SKIP:
+            k = lim
+        elif op == OP_BYTE:
+            while k < lim and data[pos + k] == arg: k += 1
+        elif op == OP_RANGE:
+            lo, hi = arg
+            while k < lim and lo <= data[pos + k] <= hi: k += 1
+        else:
+            while k < lim and arg[data[pos + k]]: k += 1
+        if k < n: return -1
+        if k == n:
+            pos += n
+            pc += 1
+            continue
+        if fail is None: fail = set()
+        for j in range(k, n - 1, -1):
+            if (key := (pc + 1, pos + j)) in fail: continue
+            if (end := run_bytecode(program, data, pos + j, endpos, caps, pc + 1, fail)) >= 0: return end
+            fail.add(key)
+        return -1
+    return pos
+
+
+class BytecodeMatch:
+    __slots__ = ('data', 'caps')
+
+    def __init__(self, data, caps: list):
+        self.data = data
+        self.caps = caps
+
+    def start(self, group=0):
+        return self.caps[group * 2]
+
+    def end(self, group=0):
+        return self.caps[group * 2 + 1]
+
+    def group(self, group=0):
+        return bytes(self.data[self.caps[group * 2]:self.caps[group * 2 + 1]])
+
+
+def _op_table(op, arg, n, m, at_end=False):
+    # 指令在开头/结尾必须匹配的字节集合（256 字节表），无法确定时为 None
+    if op == OP_LIT: return bytes(i == arg[-1 if at_end else 0] for i in range(256))
+    if n < 1 or at_end and n != m: return None
+    if op == OP_BYTE: return bytes(i == arg for i in range(256))
+    if op == OP_RANGE: return bytes(arg[0] <= i <= arg[1] for i in range(256))
+    if op == OP_MASK: return arg
+    return None
+
+
+class BytecodePattern(Pattern):
+    """
+    不经过 re 的匹配后端：指令表逐条执行，带失败记忆的回溯对 ?{n:m} 与 [xx:yy] 组合不会退化
+
+    纯 python 解释执行，普通特征码比 re 慢 10-50 倍，仅在 re 回溯退化时通过 pattern_cls 手动选用，不会自动切换，可用 bench/bench_pattern_backends.py 对比两者
+
+    候选起点优先取自最长固定字节串（偏移可不固定），否则在有 numpy 时以固定字节掩码或首/尾字节向量化过滤
+    """
+
+    def __init__(self, regex: re.Pattern, sub_matches: 'typing.List[None | Pattern]', group_flags, pattern: str):
+        super().__init__(regex, sub_matches, group_flags, pattern)
+        self.program = compile_bytecode(regex.pattern)
+        self.min_size = sum(n for op, _, n, _ in self.program if op != OP_SAVE and op != OP_LIT) + \
+                        sum(len(arg) for op, arg, _, _ in self.program if op == OP_LIT)
+        ops = [i for i in self.program if i[0] != OP_SAVE]
+        self.first_table = _op_table(*ops[0]) if ops else None
+        self.last_table = _op_table(*ops[-1], at_end=True) if ops and self.min_size == self.max_size else None
+        # 浮动锚点：最长的连续固定字节及其距开头的偏移范围
+        self.lit = b''
+        self.lit_min_off = self.lit_max_off = 0
+        min_off = max_off = 0
+        for op, arg, n, m in ops:
+            if op == OP_LIT:
+                if len(arg) > len(self.lit) or len(arg) == len(self.lit) and max_off - min_off < self.lit_max_off - self.lit_min_off:
+                    self.lit, self.lit_min_off, self.lit_max_off = arg, min_off, max_off
+                min_off += len(arg)
+                max_off += len(arg)
+            else:
+                min_off += n
+                max_off += m
+        if len(self.lit) < min_anchor_size: self.lit = b''
+
+    def match(self, data, pos=0, endpos=None) -> BytecodeMatch | None:
+        if endpos is None: endpos = len(data)
+        caps = [0] * (len(self.group_flags) + 1) * 2
+        if (end := run_bytecode(self.program, data, pos, endpos, caps)) < 0: return None
+        caps[0] = pos
+        caps[1] = end
+        return BytecodeMatch(data, caps)
+
+    def _match(self, _data: memoryview, start_at: int, res: list, ref_base=0):
+        if not (match := self.match(_data, start_at)): return False
+        return self._parse_match(_data, match, res, ref_base)
+
+    def _iter_candidates(self, _data, pos, endpos):
+        if self.lit:
+            next_start = pos
+            for i in iter_find(_data, self.lit, pos + self.lit_min_off, endpos):
+                if (end := i - self.lit_min_off + 1) > next_start:
+                    yield from range(max(i - self.lit_max_off, next_start), end)
+                    next_start = end
+        elif np is not None and len(self.mask_bytes) >= 2:
+            yield from self._iter_np_candidates(_data, pos, endpos)
+        elif np is not None and self.first_table is not None:
+            first = np.frombuffer(self.first_table, np.bool_)
+            last = np.frombuffer(self.last_table, np.bool_) if self.last_table is not None else None
+            arr = np.frombuffer(_data, np.uint8)
+            last_off = self.max_size - 1
+            stop = endpos - self.min_size + 1
+            for start in range(pos, stop, self.np_block_size):
+                end = min(start + self.np_block_size, stop)
+                mask = first[arr[start:end]]
+                if last is not None:
+                    mask &= last[arr[start + last_off:end + last_off]]
+                yield from (np.flatnonzero(mask) + start).tolist()
+        else:
+            yield from range(pos, endpos - self.min_size + 1)
+
+    def _iter_match(self, _data: bytes | bytearray | memoryview, ref_base=0, pos=0, endpos=None):
+        data = _data if isinstance(_data, memoryview) else memoryview(_data)
+        if endpos is None: endpos = len(data)
+        last_end = pos
+        for start in self._iter_candidates(_data, pos, endpos):
+            if start < last_end: continue
+            if not (match := self.match(data, start, endpos)): continue
+            last_end = match.end(0)
+            res = []
+            yield start, last_end, res if self._parse_match(data, match, res, ref_base) else None
+
+
 def fmt_bytes_regex_pattern(pat: bytes):
     s = ''
     is_escape = False
@@ -284,21 +636,280 @@ def fmt_bytes_regex_pattern(pat: bytes):
     return s
 
 
+class PatternCache(LRU):
+    """
+    以特征码文本为键的已编译 Pattern 缓存（有界、线程安全），记录命中统计
+
+    save/load 可持久化编译结果（正则、分组标记、二级匹配树），预热时无需再解析特征码；文件为 marshal 格式，只含基础类型
+    """
+
+    def __init__(self, maxsize=1024, pattern_cls: 'typing.Type[Pattern]' = None):
+        super().__init__(_maxsize=maxsize, _getter=self._compile, _threadsafe=True)
+        self.pattern_cls = pattern_cls
+        self.stats_lock = threading.Lock()
+        self.lookups = 0
+        self.misses = 0
+
+    def _compile(self, pattern: str) -> Pattern:
+        self.misses += 1
+        return compile_pattern(pattern, self.pattern_cls)
+
+    def __getitem__(self, pattern: str) -> Pattern:
+        with self.stats_lock: self.lookups += 1
+        return super().__getitem__(pattern)
+
+    def get_pattern(self, pattern: str | Pattern) -> Pattern:
+        return self[pattern] if isinstance(pattern, str) else pattern
+
+    @property
+    def stats(self):
+        return {'size': len(self), 'maxsize': self.maxsize, 'hits': self.lookups - self.misses, 'misses': self.misses}
+
+    @classmethod
+    def _dump_pattern(cls, p: Pattern):
+        return p.regex.pattern, p.group_flags, [None if sub is None else cls._dump_pattern(sub) for sub in p.sub_matches], p.pattern
+
+    def _load_pattern(self, data) -> Pattern:
+        regex, group_flags, sub_matches, pattern = data
+        return (self.pattern_cls or Pattern)(
+            re.compile(regex, re.DOTALL), [None if sub is None else self._load_pattern(sub) for sub in sub_matches], group_flags, pattern
+        )
+
+    def save(self, path: str | os.PathLike):
+        data = {k: self._dump_pattern(v) for k, v in list(self.items())}
+        tmp = pathlib.Path(str(path) + '.tmp')
+        with open(tmp, 'wb') as f:
+            marshal.dump(data, f)
+        os.replace(tmp, path)
+
+    def load(self, path: str | os.PathLike):
+        if not os.path.isfile(path): return
+        with open(path, 'rb') as f:
+            data = marshal.load(f)
+        if not isinstance(data, dict): raise ValueError(f'invalid pattern cache file {path}')
+        for k, v in data.items():
+            self[k] = self._load_pattern(v)
+
+
+pattern_cache = PatternCache()
+
+
+def literal_trie_regex(words: typing.Iterable[bytes]) -> bytes:
+    """把多个字节串合并成按前缀树展开的正则，匹配时取最长的一个"""
+    root = {}
+    for w in words:
+        node = root
+        for c in w: node = node.setdefault(c, {})
+        node[None] = None
+
+    def build(node):
+        alts = [re.escape(bytes((c,))) + build(node[c]) for c in sorted(k for k in node if k is not None)]
+        if not alts: return b''
+        res = alts[0] if len(alts) == 1 else b'(?:' + b'|'.join(alts) + b')'
+        return b'(?:' + res + b')?' if None in node else res
+
+    return build(root)
+
+
+class PatternSet:
+    """
+    将多个 Pattern 合并为一次扫描
+
+    以各 Pattern 的固定字节串为锚点去重分组，所有锚点合并为一个前缀树正则，一次扫描定位后再于推算的起点校验，
+    没有锚点的 Pattern 退回整段正则扫描
+    """
+
+    def __init__(self, patterns: 'typing.Dict[str, str | Pattern] | typing.Iterable[str | Pattern]'):
+        if not isinstance(patterns, dict):
+            patterns = {p if isinstance(p, str) else p.pattern: p for p in patterns}
+        self.patterns = {name: pattern_cache.get_pattern(p) for name, p in patterns.items()}
+        self.anchor_map: typing.Dict[bytes, typing.List[tuple[str, Pattern]]] = {}
+        self.no_anchor: typing.List[tuple[str, Pattern]] = []
+        for name, p in self.patterns.items():
+            if p.anchor:
+                self.anchor_map.setdefault(p.anchor, []).append((name, p))
+            else:
+                self.no_anchor.append((name, p))
+        # 前缀树正则在同一位置只报告最长的锚点，其前缀锚点也在此处命中
+        self.anchor_dispatch = {
+            a: [item for b, items in self.anchor_map.items() if a.startswith(b) for item in items]
+            for a in self.anchor_map
+        }
+        self.anchor_regex = re.compile(b'(?=(' + literal_trie_regex(self.anchor_map) + b'))') if self.anchor_map else None
+        self.max_anchor_offset = max((p.anchor_offset for items in self.anchor_map.values() for _, p in items), default=0)
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def finditer(self, _data: bytes | bytearray | memoryview, ref_base=0, last_end: typing.Dict[str, int] = None, stop: int = None) -> typing.Generator[tuple[str, int, list], None, None]:
+        """
+        :param last_end: 各 Pattern 上一个匹配的结尾，会被更新；分窗扫描时用于从上一窗口的匹配结尾继续
+        :param stop: 只产出起点小于 stop 的匹配
+        """
+        data = _data if isinstance(_data, memoryview) else memoryview(_data)
+        if last_end is None: last_end = {}
+        if stop is None: stop = len(data) + 1
+        for name, p in self.no_anchor:
+            for start, end, res in p._iter_match(data, ref_base, last_end.get(name, 0)):
+                if start >= stop: break
+                last_end[name] = end
+                if res is not None: yield name, start, res
+        if self.anchor_regex is None: return
+        for m in self.anchor_regex.finditer(data):
+            if (i := m.start()) - self.max_anchor_offset >= stop: break
+            for name, p in self.anchor_dispatch[bytes(m.group(1))]:
+                if (start := i - p.anchor_offset) < last_end.get(name, 0) or start >= stop: continue
+                if not (match := p.regex.match(data, start)): continue
+                last_end[name] = match.end(0)
+                res = []
+                if p._parse_match(data, match, res, ref_base):
+                    yield name, start, res
+
+
+def _scan_shared_chunk(shm_name: str, size: int, pattern: Pattern, ref_base: int, pos: int, endpos: int, stop: int):
+    shm = shared_memory.SharedMemory(shm_name)
+    try:
+        data = shm.buf[:size]
+        try:
+            return [m for m in pattern._iter_match(data, ref_base, pos, endpos) if m[0] < stop]
+        finally:
+            data.release()
+    finally:
+        shm.close()
+
+
+class ParallelScanPool:
+    """
+    多进程分块扫描
+
+    大于 chunk_size 的数据复制一次到共享内存，按 chunk_size 切块（块间重叠 pattern.max_size - 1）
+    分发到进程池，子匹配仍可访问整段数据；结果按顺序合并并去除重叠
+    """
+
+    def __init__(self, max_workers: int = None, chunk_size=0x400000):
+        self.max_workers = max_workers or os.cpu_count()
+        self.chunk_size = chunk_size
+        self.executor = concurrent.futures.ProcessPoolExecutor(self.max_workers)
+        self.shared: typing.Dict[int, tuple[typing.Any, shared_memory.SharedMemory]] = {}
+
+    def share(self, data: bytes | bytearray) -> shared_memory.SharedMemory:
+        if (s := self.shared.get(id(data))) is not None and s[0] is data:
+            return s[1]
+        shm = shared_memory.SharedMemory(create=True, size=max(len(data), 1))
+        shm.buf[:len(data)] = data
+        self.shared[id(data)] = data, shm
+        return shm
+
+    def unshare(self, data: bytes | bytearray):
+        if (s := self.shared.get(id(data))) is not None and s[0] is data:
+            del self.shared[id(data)]
+            s[1].close()
+            s[1].unlink()
+
+    def finditer(self, pattern: Pattern, data: bytes | bytearray, ref_base=0, keep_shared=True):
+        size = len(data)
+        if size <= self.chunk_size:
+            yield from pattern.finditer(data, ref_base)
+            return
+        shm = self.share(data)
+        futures = []
+        try:
+            overlap = max(pattern.max_size - 1, 0)
+            futures = [self.executor.submit(
+                _scan_shared_chunk, shm.name, size, pattern, ref_base,
+                pos, min(pos + self.chunk_size + overlap, size), pos + self.chunk_size
+            ) for pos in range(0, size, self.chunk_size)]
+            last_end = 0
+            for pos, future in zip(range(0, size, self.chunk_size), futures):
+                results = future.result()
+                if last_end > pos:  # 上一块的匹配越过了块边界，从 last_end 顺序扫描直到与本块结果对齐
+                    stop = pos + self.chunk_size
+                    starts = {m[0]: i for i, m in enumerate(results)}
+                    synced = None
+                    for start, end, res in pattern._iter_match(data, ref_base, last_end):
+                        if start >= stop or (synced := starts.get(start)) is not None: break
+                        last_end = end
+                        if res is not None: yield start, res
+                    results = results[synced:] if synced is not None else []
+                for start, end, res in results:
+                    last_end = end
+                    if res is not None: yield start, res
+        finally:
+            for future in futures: future.cancel()
+            if not keep_shared: self.unshare(data)
+
+    def close(self):
+        self.executor.shutdown()
+        for _, shm in self.shared.values():
+            shm.close()
+            shm.unlink()
+        self.shared.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 class IPatternScanner:
-    def search(self, pattern: str | Pattern) -> typing.Generator[tuple[int, list[int]], None, None]:
+    pool: ParallelScanPool | None = None
+    keep_shared = True  # 使用 pool 时是否保留数据的共享内存副本
+
+    def iter_region(self, order: typing.Callable[[int], typing.Any] = None) -> typing.Iterable[tuple[int, bytes | bytearray | memoryview]]:
+        """
+        依次产出 (基址, 数据)，数据应在迭代到时才读取
+
+        :param order: 以区域基址为参数的排序键，用于优先扫描某些区域
+        """
         raise NotImplementedError
 
+    def default_order(self, address: int) -> typing.Any:
+        """
+        find_first 默认的区域优先级
+        """
+        return 0
+
+    def search(self, pattern: str | Pattern, order: typing.Callable[[int], typing.Any] = None) -> typing.Generator[tuple[int, list[int]], None, None]:
+        pattern = pattern_cache.get_pattern(pattern)
+        for ba, data in self.iter_region(order):
+            for offset, args in (self.pool.finditer(pattern, data, keep_shared=self.keep_shared) if self.pool else pattern.finditer(data)):
+                yield ba + offset, [a + ba if r else a for a, r in zip(args, pattern.res_is_ref)]
+
+    def search_set(self, patterns: 'PatternSet | typing.Dict[str, str | Pattern] | typing.Iterable[str | Pattern]') -> typing.Dict[str, typing.List[tuple[int, list[int]]]]:
+        if not isinstance(patterns, PatternSet): patterns = PatternSet(patterns)
+        res = {name: [] for name in patterns.patterns}
+        for ba, data in self.iter_region():
+            for name, offset, args in patterns.finditer(data):
+                res[name].append((ba + offset, [a + ba if r else a for a, r in zip(args, patterns.patterns[name].res_is_ref)]))
+        return res
+
     def search_unique(self, pattern: str | Pattern) -> tuple[int, list[int]]:
         s = self.search(pattern)
         try:
-            res = next(s)
-        except StopIteration:
-            raise KeyError('pattern not found')
+            try:
+                res = next(s)
+            except StopIteration:
+                raise KeyError('pattern not found')
+            try:
+                next(s)
+            except StopIteration:
+                return res
+            raise KeyError('pattern is not unique, at least 2 is found')
+        finally:
+            s.close()
+
+    def find_first(self, pattern: str | Pattern, order: typing.Callable[[int], typing.Any] = None) -> tuple[int, list[int]]:
+        """
+        按区域优先级返回第一个匹配，找到后不再读取/扫描剩余区域
+        """
+        s = self.search(pattern, order or self.default_order)
         try:
-            next(s)
+            return next(s)
         except StopIteration:
-            return res
-        raise KeyError('pattern is not unique, at least 2 is found')
+            raise KeyError('pattern not found')
+        finally:
+            s.close()
 
     def find_addresses(self, pattern: str | Pattern):
         for address, _ in self.search(pattern):
@@ -315,56 +926,406 @@ class IPatternScanner:
         return self.search_unique(pattern)[1]
 
 
+def is_text_section(sect: pefile.SectionStructure):
+    return sect.Name.rstrip(b'\0') == b'.text'
+
+
+def is_executable_section(sect: pefile.SectionStructure):
+    return bool(sect.Characteristics & pefile.SECTION_CHARACTERISTICS['IMAGE_SCN_MEM_EXECUTE'])
+
+
 class StaticPatternSearcher(IPatternScanner):
-    def __init__(self, pe, base_address=0):
-        self.pe = pe if isinstance(pe, pefile.PE) else pefile.PE(pe, fast_load=True)
-        self.text_sections = [sect for sect in self.pe.sections if sect.Name.rstrip(b'\0') == b'.text']
-        self.section_datas = [sect.get_data() for sect in self.text_sections]
+    def __init__(
+            self, pe, base_address=0, pool: ParallelScanPool = None, zero_copy=False,
+            section_filter: typing.Callable[[pefile.SectionStructure], bool] = is_text_section
+    ):
+        """
+        :param pe: pefile.PE 或 pe 文件路径（路径会被 mmap 一次），传入的 pefile.PE 不会在 close 时关闭
+        :param zero_copy: 以 memoryview 直接引用 pe 数据中的节，不复制节数据
+        :param section_filter: 选择扫描的节，默认仅 .text，可用 is_executable_section 扫描所有可执行节
+        """
+        self._owns_pe = not isinstance(pe, pefile.PE)
+        self.pe = pefile.PE(pe, fast_load=True) if self._owns_pe else pe
+        self.text_sections = sorted((sect for sect in self.pe.sections if section_filter(sect)), key=lambda sect: sect.VirtualAddress)
+        if zero_copy:
+            pe_data = memoryview(self.pe.__data__)
+            self.section_datas = [pe_data[(start := sect.get_PointerToRawData_adj()):max(start, min(
+                start + sect.SizeOfRawData, sect.PointerToRawData + sect.SizeOfRawData
+            ))] for sect in self.text_sections]
+        else:
+            self.section_datas = [sect.get_data() for sect in self.text_sections]
         self.section_virtual_addresses = [sect.VirtualAddress for sect in self.text_sections]
         self.base_address = base_address
+        self.pool = pool
 
     def get_original_text(self, address, size):
-        i = 0
-        for i, a in enumerate(self.section_virtual_addresses):
-            if a > address: break
-        i -= 1
-        section_address = address - self.base_address - self.section_virtual_addresses[i]
-        return self.section_datas[i][section_address:section_address + size]
+        rva = address - self.base_address
+        if (i := bisect.bisect_right(self.section_virtual_addresses, rva) - 1) < 0 or \
+                (section_address := rva - self.section_virtual_addresses[i]) >= len(self.section_datas[i]):
+            raise ValueError(f'address {address:#x} is not in any scanned section')
+        return bytes(self.section_datas[i][section_address:section_address + size])
+
+    def close(self):
+        for data in self.section_datas:
+            if isinstance(data, memoryview): data.release()
+        self.section_datas = []
+        if self._owns_pe: self.pe.close()
+
+    def section_base(self, address: int) -> int:
+        return self.base_address + self.section_virtual_addresses[max(bisect.bisect_right(self.section_virtual_addresses, address - self.base_address) - 1, 0)]
+
+    def iter_region(self, order: typing.Callable[[int], typing.Any] = None):
+        regions = [(self.base_address + va, data) for va, data in zip(self.section_virtual_addresses, self.section_datas)]
+        if order is not None: regions.sort(key=lambda r: order(r[0]))
+        return regions
+
+
+class CachedPatternSearcher(StaticPatternSearcher):
+    """
+    带磁盘缓存的 StaticPatternSearcher
 
-    def search(self, pattern: str | Pattern) -> typing.Generator[tuple[int, list[int]], None, None]:
-        if isinstance(pattern, str):  pattern = compile_pattern(pattern)
-        for i in range(len(self.text_sections)):
-            sect_off = self.base_address + self.section_virtual_addresses[i]
-            for offset, args in pattern.finditer(self.section_datas[i]):
-                yield sect_off + offset, [a + sect_off if r else a for a, r in zip(args, pattern.res_is_ref)]
+    缓存文件默认放在 pe 文件旁（<pe>.sigcache，json 格式），以 TimeDateStamp/CheckSum/节数据哈希为键，
+    pe 变化时自动失效；缓存结果不含 base_address，可在不同基址间复用
+    未命中的结果先记在内存中，auto_save 时在 search_set 结束、close 或退出 with 时一次写入，也可手动 flush
+    """
+    cache_version = 2
+
+    def __init__(
+            self, pe, base_address=0, cache_path: str | os.PathLike = None, auto_save=True, pool: ParallelScanPool = None, zero_copy=False,
+            section_filter: typing.Callable[[pefile.SectionStructure], bool] = is_text_section
+    ):
+        if cache_path is None and not isinstance(pe, pefile.PE):
+            cache_path = str(pe) + '.sigcache'
+        super().__init__(pe, base_address, pool, zero_copy, section_filter)
+        self.cache_path = pathlib.Path(cache_path) if cache_path is not None else None
+        self.auto_save = auto_save
+        self.cache_key = self.calc_cache_key()
+        self.cache: typing.Dict[str, tuple[list, list]] = {}  # pattern -> (res_is_ref, [(rva, args)])
+        self.dirty = False
+        self.load()
+
+    def calc_cache_key(self):
+        h = hashlib.blake2b(digest_size=16)
+        for va, data in zip(self.section_virtual_addresses, self.section_datas):
+            h.update(va.to_bytes(8, 'little'))
+            h.update(data)
+        return [self.cache_version, self.pe.FILE_HEADER.TimeDateStamp, self.pe.OPTIONAL_HEADER.CheckSum, h.hexdigest()]
+
+    def load(self):
+        if self.cache_path is None or not self.cache_path.is_file(): return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data['key'] == self.cache_key:
+                self.cache = {
+                    k: (res_is_ref, [(a, [bytes.fromhex(v['hex']) if isinstance(v, dict) else v for v in args]) for a, args in res])
+                    for k, (res_is_ref, res) in data['cache'].items()
+                }
+        except Exception:
+            return
+
+    def save(self):
+        self.dirty = False
+        if self.cache_path is None: return
+        # ^ 捕获的结果为 bytes，以 {'hex': ...} 保存
+        cache = {
+            k: (res_is_ref, [(a, [{'hex': v.hex()} if isinstance(v, (bytes, bytearray)) else v for v in args]) for a, args in res])
+            for k, (res_is_ref, res) in self.cache.items()
+        }
+        tmp = self.cache_path.with_name(self.cache_path.name + '.tmp')
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'key': self.cache_key, 'cache': cache}, f)
+            os.replace(tmp, self.cache_path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def flush(self):
+        if self.dirty: self.save()
+
+    def close(self):
+        try:
+            if self.auto_save: self.flush()
+        finally:
+            super().close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.dirty = False
+        if self.cache_path is not None:
+            self.cache_path.unlink(missing_ok=True)
+
+    def _store(self, key: str, res_is_ref: list, res: typing.Iterable[tuple[int, list[int]]]):
+        base = self.base_address
+        self.cache[key] = cached = res_is_ref, [(a - base, [v - base if r else v for v, r in zip(args, res_is_ref)]) for a, args in res]
+        self.dirty = True
+        return cached
+
+    def _load_res(self, cached: tuple[list, list]):
+        base = self.base_address
+        res_is_ref, res = cached
+        return [(a + base, [v + base if r else v for v, r in zip(args, res_is_ref)]) for a, args in res]
+
+    def search(self, pattern: str | Pattern, order: typing.Callable[[int], typing.Any] = None) -> typing.Generator[tuple[int, list[int]], None, None]:
+        key = pattern if isinstance(pattern, str) else pattern.pattern
+        if (cached := self.cache.get(key)) is None:
+            pattern = pattern_cache.get_pattern(pattern)
+            cached = self._store(key, pattern.res_is_ref, super().search(pattern))
+        res = self._load_res(cached)
+        if order is not None: res.sort(key=lambda r: order(self.section_base(r[0])))
+        yield from res
+
+    def search_set(self, patterns) -> typing.Dict[str, typing.List[tuple[int, list[int]]]]:
+        if not isinstance(patterns, PatternSet): patterns = PatternSet(patterns)
+        res = {}
+        missing = {}
+        for name, p in patterns.patterns.items():
+            if (cached := self.cache.get(p.pattern)) is None:
+                missing[name] = p
+            else:
+                res[name] = self._load_res(cached)
+        if missing:
+            for name, _res in super().search_set(PatternSet(missing)).items():
+                res[name] = self._load_res(self._store(missing[name].pattern, missing[name].res_is_ref, _res))
+            if self.auto_save: self.flush()
+        return res
+
+
+@dataclasses.dataclass
+class ScanPlan:
+    regions: typing.List[tuple[int, int]]  # [(地址, 大小)]，每项一次读取
+    region_count: int  # 合并前的区域数
+
+    @property
+    def size(self):
+        return sum(size for _, size in self.regions)
+
+    def __str__(self):
+        return f'{len(self.regions)} reads ({self.region_count} regions), {self.size:#x} bytes'
 
 
 class MemoryPatternScanner(IPatternScanner):
-    def __init__(self, p_handle, *region_address):
-        self.p_handle = p_handle
+    keep_shared = False
+
+    def __init__(
+            self, driver: 'DriverBase | int', *region_address, pool: ParallelScanPool = None, window_size: int = None, cache_size=0x10000000,
+            protect: str = None, region_type: str | typing.Iterable[str] = None, modules: typing.Iterable[str] = None, merge_regions=True,
+            incremental=False, page_size=0x1000,
+    ):
+        """
+        :param driver: DriverBase，或 win32 进程句柄
+        :param region_address: 只扫描包含这些地址的内存区域
+        :param window_size: 设置后以流式模式扫描：按该大小分窗读入复用的缓冲区逐窗扫描，不缓存区域数据
+        :param cache_size: 非流式模式下区域数据缓存的字节上限
+        :param protect: 只扫描包含这些权限的区域，如 'rx'
+        :param region_type: 只扫描这些类型的区域：image / mapped / private
+        :param modules: 只扫描这些模块（文件名或完整路径，不区分大小写）内的区域
+        :param merge_regions: 相邻且属性相同的区域合并为一次读取
+        :param incremental: 增量模式：每次搜索都重新读取区域，按 page_size 分页记录内容哈希，只重新扫描内容变化的页附近，其余沿用上次的匹配
+        """
+        if not isinstance(driver, DriverBase):
+            from .driver.win32 import Win32Driver
+            driver = Win32Driver(driver)
+        self.driver = driver
+        self.pool = pool
+        self.window_size = window_size
+        self.protect = protect
+        self.region_type = (region_type,) if isinstance(region_type, str) else region_type
+        self.modules = modules
+        self.merge_regions = merge_regions
+        self.incremental = incremental
+        self.page_size = page_size
+        # {特征码: {(区域地址, 区域大小): (各页哈希, [(start, end, res)])}}
+        self.incremental_state: typing.Dict[str, typing.Dict[tuple[int, int], tuple[list[bytes], list[tuple[int, int, list | None]]]]] = {}
         if region_address:
+            regions = list(driver.iter_memory_region())
             self.region = []
             for a in region_address:
-                mbi = next(memory.iter_memory_region(p_handle, next(memory.iter_memory_region(p_handle, a, a))))
-                self.region.append((mbi.BaseAddress, mbi.RegionSize))
+                for region in regions:
+                    if region.address <= a < region.address + region.size:
+                        self.region.append((region.address, region.size))
+                        break
+                else:
+                    raise ValueError(f'address {a:#x} is not in any readable region')
         else:
             self.region = None
-        self.cache = {}
+        self.cache = SizedLRU(cache_size)
+        self._main_module = None
 
     def get_region_data(self, address, size):
+        if self.incremental:  # 增量模式需要最新数据
+            return self.driver.read_bytes(address, size)
         key = address, size
-        if key in self.cache:
-            return self.cache[key]
-        self.cache[key] = res = memory.read_bytes(self.p_handle, address, size)
+        if (res := self.cache.get(key)) is not None:
+            return res
+        self.cache[key] = res = self.driver.read_bytes(address, size)
         return res
 
-    def iter_region(self):
-        if self.region is None:
-            for mbi in memory.iter_memory_region(self.p_handle):
-                yield mbi.BaseAddress, self.get_region_data(mbi.BaseAddress, mbi.RegionSize)
+    def default_order(self, address: int):
+        # 主模块优先
+        if self._main_module is None:
+            module = self.driver.base_module()
+            self._main_module = module.image_base, module.image_base + module.image_size
+        return not self._main_module[0] <= address < self._main_module[1]
 
-    def search(self, pattern: str | Pattern) -> typing.Generator[tuple[int, list[int]], None, None]:
-        if isinstance(pattern, str):  pattern = compile_pattern(pattern)
-        for ba, data in self.iter_region():
-            for offset, args in pattern.finditer(data):
-                yield ba + offset, [a + ba if r else a for a, r in zip(args, pattern.res_is_ref)]
+    def plan(self) -> ScanPlan:
+        """
+        按过滤条件列出要扫描的区域，可在扫描前查看计划读取的字节数
+        """
+        if self.region is not None:
+            return ScanPlan(list(self.region), len(self.region))
+        module_ranges = None
+        if self.modules is not None:
+            names = {m.lower() for m in self.modules}
+            module_ranges = [
+                (m.image_base, m.image_base + m.image_size) for m in self.driver.iter_modules()
+                if m.file_path.lower() in names or pathlib.PureWindowsPath(m.file_path).name.lower() in names
+            ]
+        regions = []
+        count = 0
+        for region in self.driver.iter_memory_region():
+            if self.protect and not all(c in region.protect for c in self.protect): continue
+            if self.region_type and region.type not in self.region_type: continue
+            if module_ranges is not None and not any(start <= region.address < end for start, end in module_ranges): continue
+            count += 1
+            if self.merge_regions and regions and (last := regions[-1])[0] + last[1] == region.address and last[2] == (region.protect, region.type):
+                last[1] += region.size
+            else:
+                regions.append([region.address, region.size, (region.protect, region.type)])
+        return ScanPlan([(address, size) for address, size, _ in regions], count)
+
+    def _iter_region_span(self, order: typing.Callable[[int], typing.Any] = None) -> typing.Iterable[tuple[int, int]]:
+        regions = self.plan().regions
+        if order is not None: regions.sort(key=lambda r: order(r[0]))
+        return regions
+
+    def iter_region(self, order: typing.Callable[[int], typing.Any] = None):
+        for address, size in self._iter_region_span(order):
+            try:
+                data = self.get_region_data(address, size)
+            except Exception:  # 区域可能在枚举后被释放或修改了保护属性
+                continue
+            yield address, data
+
+    def _iter_windows(self, overlap: int, order: typing.Callable[[int], typing.Any] = None) -> typing.Generator[tuple[int, memoryview, int], None, None]:
+        # 产出 (窗口基址, 窗口数据, stop)，相邻窗口重叠 overlap 字节，只应接受起点 < stop 的匹配
+        # 缓冲区由每次调用各自分配，在本次迭代内复用，窗口数据迭代到下一个窗口后即失效
+        step = self.window_size
+        view = memoryview(bytearray(step + overlap))
+        for address, size in self._iter_region_span(order):
+            for off in range(0, size, step):
+                n = min(step + overlap, size - off)
+                try:
+                    self.driver.read_into(address + off, view[:n])
+                except Exception:  # 区域可能在枚举后被释放或修改了保护属性
+                    break
+                yield address + off, view[:n], n + 1 if off + step >= size else step  # 最后一个窗口不限制起点
+
+    def can_stream(self, pattern: Pattern) -> bool:
+        # 二级匹配需要跳转到窗口外的数据，只能整段扫描
+        return bool(self.window_size) and all(sub is None for sub in pattern.sub_matches)
+
+    def _page_hashes(self, data: memoryview) -> list[bytes]:
+        return [hashlib.blake2b(data[i:i + self.page_size], digest_size=8).digest() for i in range(0, len(data), self.page_size)]
+
+    def _rescan_region(self, pattern: Pattern, data: memoryview, hashes: list[bytes], state) -> list[tuple[int, int, list | None]]:
+        # 只重新扫描起点落在 [脏页起点 - (max_size - 1), 脏页终点) 的匹配，扫描越过脏页后与旧结果重新对齐即停止
+        if state is None or len(state[0]) != len(hashes):
+            return list(pattern._iter_match(data))
+        old_hashes, old = state
+        ranges = []
+        for i, (h, old_h) in enumerate(zip(hashes, old_hashes)):
+            if h == old_h: continue
+            start = i * self.page_size
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = start + self.page_size
+            else:
+                ranges.append([start, start + self.page_size])
+        if not ranges: return old
+        overlap = max(pattern.max_size - 1, 0)
+        new = []
+        k = 0
+        pos = 0
+        for j, (a, b) in enumerate(ranges):
+            lo = max(a - overlap, 0)
+            next_lo = ranges[j + 1][0] - overlap if j + 1 < len(ranges) else len(data) + 1
+            while k < len(old) and old[k][0] < lo:
+                if old[k][0] >= pos:
+                    new.append(old[k])
+                    pos = old[k][1]
+                k += 1
+            for start, end, res in pattern._iter_match(data, 0, max(lo, pos)):
+                if start >= next_lo: break  # 交给下一个脏区间
+                if start >= b:
+                    while k < len(old) and old[k][0] < start: k += 1
+                    if k < len(old) and old[k][:2] == (start, end): break
+                new.append((start, end, res))
+                pos = end
+            while k < len(old) and old[k][0] < b: k += 1  # 脏区间内的旧匹配均已失效
+        for m in old[k:]:
+            if m[0] >= pos:
+                new.append(m)
+                pos = m[1]
+        return new
+
+    def _search_incremental(self, pattern: Pattern, order: typing.Callable[[int], typing.Any] = None) -> typing.Generator[tuple[int, list[int]], None, None]:
+        states = self.incremental_state.get(pattern.pattern, {})
+        new_states = {}
+        finished = False
+        try:
+            for address, size in self._iter_region_span(order):
+                try:
+                    data = memoryview(self.driver.read_bytes(address, size))
+                except Exception:  # 区域可能在枚举后被释放或修改了保护属性
+                    continue
+                hashes = self._page_hashes(data)
+                matches = self._rescan_region(pattern, data, hashes, states.get((address, size)))
+                new_states[address, size] = hashes, matches
+                for start, end, args in matches:
+                    if args is not None:
+                        yield address + start, [a + address if r else a for a, r in zip(args, pattern.res_is_ref)]
+            finished = True
+        finally:
+            # 中途停止时保留未扫描区域的旧状态，完整扫描后丢弃已消失的区域
+            self.incremental_state[pattern.pattern] = new_states if finished else states | new_states
+
+    def search(self, pattern: str | Pattern, order: typing.Callable[[int], typing.Any] = None) -> typing.Generator[tuple[int, list[int]], None, None]:
+        pattern = pattern_cache.get_pattern(pattern)
+        if self.incremental and all(sub is None for sub in pattern.sub_matches):
+            yield from self._search_incremental(pattern, order)
+            return
+        if not self.can_stream(pattern):
+            yield from super().search(pattern, order)
+            return
+        last_end = 0
+        for base, data, stop in self._iter_windows(max(pattern.max_size - 1, 0), order):
+            # 从上一个匹配的结尾继续，与整段扫描的结果一致
+            for start, end, args in pattern._iter_match(data, 0, max(last_end - base, 0)):
+                if start >= stop: break
+                last_end = base + end
+                if args is not None:
+                    yield base + start, [a + base if r else a for a, r in zip(args, pattern.res_is_ref)]
+
+    def search_set(self, patterns: 'PatternSet | typing.Dict[str, str | Pattern] | typing.Iterable[str | Pattern]') -> typing.Dict[str, typing.List[tuple[int, list[int]]]]:
+        if not isinstance(patterns, PatternSet): patterns = PatternSet(patterns)
+        if self.incremental: return {name: list(self.search(p)) for name, p in patterns.patterns.items()}
+        if not self.window_size: return super().search_set(patterns)
+        streamable = {name: p for name, p in patterns.patterns.items() if self.can_stream(p)}
+        rest = {name: p for name, p in patterns.patterns.items() if name not in streamable}
+        res = super().search_set(rest) if rest else {}
+        if streamable:
+            stream_set = PatternSet(streamable)
+            res.update((name, []) for name in streamable)
+            last_end = {}
+            for base, data, stop in self._iter_windows(max(max(p.max_size for p in streamable.values()) - 1, 0)):
+                window_last_end = {name: max(end - base, 0) for name, end in last_end.items()}
+                for name, offset, args in stream_set.finditer(data, 0, window_last_end, stop):
+                    res[name].append((base + offset, [a + base if r else a for a, r in zip(args, streamable[name].res_is_ref)]))
+                last_end = {name: base + end for name, end in window_last_end.items()}
+        return {name: res[name] for name in patterns.patterns}
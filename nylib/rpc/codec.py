@@ -0,0 +1,241 @@
+"""
+tcp_json 使用的消息编码
+json: 每条消息一行 json, 默认, 与旧版本兼容
+binary: 4 字节小端长度前缀 + msgpack 格式的消息体, 原生支持 bytes, 安装了 msgpack 时使用其实现
+"""
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+_u8 = struct.Struct('>B')
+_u16 = struct.Struct('>H')
+_u32 = struct.Struct('>I')
+_u64 = struct.Struct('>Q')
+_i8 = struct.Struct('>b')
+_i16 = struct.Struct('>h')
+_i32 = struct.Struct('>i')
+_i64 = struct.Struct('>q')
+_f32 = struct.Struct('>f')
+_f64 = struct.Struct('>d')
+_frame_head = struct.Struct('<I')
+
+
+def _pack_len(buf: bytearray, n, fix_tag, fix_max, tag8, tag16, tag32):
+    if n <= fix_max:
+        buf.append(fix_tag | n)
+    elif tag8 is not None and n < 0x100:
+        buf.append(tag8)
+        buf.append(n)
+    elif n < 0x10000:
+        buf.append(tag16)
+        buf += _u16.pack(n)
+    else:
+        buf.append(tag32)
+        buf += _u32.pack(n)
+
+
+def _pack(buf: bytearray, obj):
+    if obj is None:
+        buf.append(0xc0)
+    elif obj is True:
+        buf.append(0xc3)
+    elif obj is False:
+        buf.append(0xc2)
+    elif isinstance(obj, int):
+        if 0 <= obj < 0x80:
+            buf.append(obj)
+        elif -0x20 <= obj < 0:
+            buf.append(obj & 0xff)
+        elif obj >= 0:
+            if obj < 0x100:
+                buf.append(0xcc)
+                buf.append(obj)
+            elif obj < 0x10000:
+                buf.append(0xcd)
+                buf += _u16.pack(obj)
+            elif obj < 0x100000000:
+                buf.append(0xce)
+                buf += _u32.pack(obj)
+            elif obj < 0x10000000000000000:
+                buf.append(0xcf)
+                buf += _u64.pack(obj)
+            else:
+                raise OverflowError(f'int too big to pack: {obj}')
+        elif obj >= -0x80:
+            buf.append(0xd0)
+            buf += _i8.pack(obj)
+        elif obj >= -0x8000:
+            buf.append(0xd1)
+            buf += _i16.pack(obj)
+        elif obj >= -0x80000000:
+            buf.append(0xd2)
+            buf += _i32.pack(obj)
+        elif obj >= -0x8000000000000000:
+            buf.append(0xd3)
+            buf += _i64.pack(obj)
+        else:
+            raise OverflowError(f'int too small to pack: {obj}')
+    elif isinstance(obj, float):
+        buf.append(0xcb)
+        buf += _f64.pack(obj)
+    elif isinstance(obj, str):
+        b = obj.encode('utf-8')
+        _pack_len(buf, len(b), 0xa0, 0x1f, 0xd9, 0xda, 0xdb)
+        buf += b
+    elif isinstance(obj, (bytes, bytearray, memoryview)):
+        n = obj.nbytes if isinstance(obj, memoryview) else len(obj)
+        _pack_len(buf, n, 0, -1, 0xc4, 0xc5, 0xc6)
+        buf += obj
+    elif isinstance(obj, (list, tuple)):
+        _pack_len(buf, len(obj), 0x90, 0xf, None, 0xdc, 0xdd)
+        for i in obj: _pack(buf, i)
+    elif isinstance(obj, dict):
+        _pack_len(buf, len(obj), 0x80, 0xf, None, 0xde, 0xdf)
+        for k, v in obj.items():
+            _pack(buf, k)
+            _pack(buf, v)
+    else:
+        raise TypeError(f'can not pack object of type {type(obj).__name__}')
+
+
+def _unpack(view: memoryview, pos):
+    t = view[pos]
+    pos += 1
+    if t < 0x80: return t, pos
+    if t >= 0xe0: return t - 0x100, pos
+    if t <= 0x8f: return _unpack_map(view, pos, t & 0xf)
+    if t <= 0x9f: return _unpack_array(view, pos, t & 0xf)
+    if t <= 0xbf: return str(view[pos:pos + (n := t & 0x1f)], 'utf-8'), pos + n
+    if t == 0xc0: return None, pos
+    if t == 0xc2: return False, pos
+    if t == 0xc3: return True, pos
+    if t in _num_tags:
+        s = _num_tags[t]
+        return s.unpack_from(view, pos)[0], pos + s.size
+    if t in _len_tags:
+        s, kind = _len_tags[t]
+        n, = s.unpack_from(view, pos)
+        pos += s.size
+        if kind == 0: return view[pos:pos + n].tobytes(), pos + n
+        if kind == 1: return str(view[pos:pos + n], 'utf-8'), pos + n
+        if kind == 2: return _unpack_array(view, pos, n)
+        return _unpack_map(view, pos, n)
+    raise ValueError(f'unknown type tag {t:#x} at {pos - 1}')
+
+
+def _unpack_array(view, pos, n):
+    res = []
+    for _ in range(n):
+        v, pos = _unpack(view, pos)
+        res.append(v)
+    return res, pos
+
+
+def _unpack_map(view, pos, n):
+    res = {}
+    for _ in range(n):
+        k, pos = _unpack(view, pos)
+        res[k], pos = _unpack(view, pos)
+    return res, pos
+
+
+_num_tags = {0xca: _f32, 0xcb: _f64, 0xcc: _u8, 0xcd: _u16, 0xce: _u32, 0xcf: _u64, 0xd0: _i8, 0xd1: _i16, 0xd2: _i32, 0xd3: _i64}
+_len_tags = {  # tag: (长度格式, 0 bytes / 1 str / 2 array / 3 map)
+    0xc4: (_u8, 0), 0xc5: (_u16, 0), 0xc6: (_u32, 0),
+    0xd9: (_u8, 1), 0xda: (_u16, 1), 0xdb: (_u32, 1),
+    0xdc: (_u16, 2), 0xdd: (_u32, 2),
+    0xde: (_u16, 3), 0xdf: (_u32, 3),
+}
+
+
+def pack(obj) -> bytes:
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    _pack(buf := bytearray(), obj)
+    return bytes(buf)
+
+
+def unpack(data):
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    view = memoryview(data)
+    res, pos = _unpack(view, 0)
+    if pos != len(view): raise ValueError('extra data after packed object')
+    return res
+
+
+class JsonCodec:
+    """每条消息一行 json"""
+    name = 'json'
+
+    @staticmethod
+    def dumps(data) -> bytes:
+        return json.dumps(data).encode('utf-8') + b'\n'
+
+    @staticmethod
+    def split(buffer: bytearray, limit: int = None):
+        """从 buffer 中解出所有完整消息 (最多 limit 条), 返回 (消息列表, 已消耗字节数)"""
+        res = []
+        pos = 0
+        while len(res) != limit and (idx := buffer.find(10, pos)) >= 0:
+            res.append(json.loads(buffer[pos:idx]))
+            pos = idx + 1
+        return res, pos
+
+    @staticmethod
+    def read(rfile):
+        """从文件对象读取一条消息, 结束时返回 None"""
+        if line := rfile.readline():
+            return json.loads(line)
+
+    @staticmethod
+    async def aread(reader):
+        if line := await reader.readline():
+            return json.loads(line)
+
+
+class BinaryCodec:
+    """4 字节小端长度前缀 + msgpack 格式消息体"""
+    name = 'binary'
+
+    @staticmethod
+    def dumps(data) -> bytes:
+        body = pack(data)
+        return _frame_head.pack(len(body)) + body
+
+    @staticmethod
+    def split(buffer: bytearray, limit: int = None):
+        res = []
+        pos = 0
+        end = len(buffer)
+        with memoryview(buffer) as view:
+            while len(res) != limit and end - pos >= 4:
+                size, = _frame_head.unpack_from(view, pos)
+                if end - pos - 4 < size: break
+                with view[pos + 4:pos + 4 + size] as body:
+                    res.append(unpack(body))
+                pos += 4 + size
+        return res, pos
+
+    @staticmethod
+    def read(rfile):
+        if len(head := rfile.read(4)) == 4:
+            size, = _frame_head.unpack(head)
+            if len(body := rfile.read(size)) == size:
+                return unpack(body)
+
+    @staticmethod
+    async def aread(reader):
+        try:
+            size, = _frame_head.unpack(await reader.readexactly(4))
+            return unpack(await reader.readexactly(size))
+        except EOFError:  # IncompleteReadError
+            return None
+
+
+CODECS = {c.name: c for c in (JsonCodec, BinaryCodec)}
+CODEC_NEGOTIATE_KEY = '__codec__'
@@ -1,4 +1,4 @@
-import json
+import concurrent.futures
 import threading
 import time
 import traceback
@@ -8,10 +8,13 @@ import typing
 import socketserver
 
 from nylib.utils import Counter, ResEventList, AsyncEvtList
+from .codec import JsonCodec, CODECS, CODEC_NEGOTIATE_KEY
 
 CLIENT_CALL = 0
 CLIENT_SUBSCRIBE = 1
 CLIENT_UNSUBSCRIBE = 2
+CLIENT_CREDIT = 3
+CLIENT_CANCEL = 4
 
 SERVER_RETURN = 0
 SERVER_EVENT = 1
@@ -21,19 +24,88 @@ RETURN_EXCEPTION = 1
 RETURN_GENERATOR = 2
 RETURN_GENERATOR_END = 3
 
+PING_KEY = '__ping__'
+PONG = '__pong__'
+CONNECTION_CLOSED = {'type': 'ConnectionResetError', 'str': 'rpc connection closed', 'trace': ''}
+
+
+class WriteCoalescer:
+    """
+    合并写入: 没有线程在发送时直接发送, 否则追加到缓冲区, 由正在发送的线程在空闲前一并发出
+    """
+
+    def __init__(self, write_func):
+        self.write_func = write_func
+        self.lock = threading.Lock()
+        self.pending = bytearray()
+        self.writing = False
+
+    def write(self, data):
+        with self.lock:
+            self.pending += data
+            if self.writing: return
+            self.writing = True
+        try:
+            while True:
+                with self.lock:
+                    if not self.pending:
+                        self.writing = False
+                        return
+                    buf, self.pending = self.pending, bytearray()
+                self.write_func(buf)
+        except BaseException:
+            with self.lock:
+                self.writing = False
+            raise
+
+
+class StreamCredit:
+    """
+    生成器流的发送额度, 客户端在调用时给出初始额度 (credit), 之后通过 CLIENT_CREDIT 补充
+    额度用完时生成器暂停, CLIENT_CANCEL 或连接断开时停止
+    """
+
+    def __init__(self, credit):
+        self.credit = credit
+        self.cancelled = False
+        self.cond = threading.Condition()
+
+    def grant(self, n):
+        with self.cond:
+            self.credit += n
+            self.cond.notify()
+
+    def cancel(self):
+        with self.cond:
+            self.cancelled = True
+            self.cond.notify()
+
+    def acquire(self):
+        """取得一个额度, 流被取消时返回 False"""
+        with self.cond:
+            self.cond.wait_for(lambda: self.credit > 0 or self.cancelled)
+            if self.cancelled: return False
+            self.credit -= 1
+            return True
+
 
 class RpcHandler(socketserver.StreamRequestHandler):
     server: 'RpcServer'
+    disable_nagle_algorithm = True
 
     def __init__(self, request, client_address, server, client_id):
         self.client_id = client_id
-        self.send_lock = threading.Lock()
         self.subscribed = set()
+        self.codec = JsonCodec
+        self.streams: typing.Dict[int, StreamCredit] = {}
         super().__init__(request, client_address, server)
 
+    def setup(self):
+        super().setup()
+        self.writer = WriteCoalescer(self.wfile.write)
+
     def send(self, data):
-        msg = json.dumps(data).encode('utf8') + b'\n'
-        with self.send_lock: self.wfile.write(msg)
+        self.writer.write(self.codec.dumps(data))
 
     def send_event(self, event_id, event):
         self.send({
@@ -63,14 +135,23 @@ class RpcHandler(socketserver.StreamRequestHandler):
         })
 
     def reply_call_gen(self, reply_id, gen):
+        stream = self.streams.get(reply_id)
         try:
-            for res in gen:
+            # 有额度限制时先取得额度再推进生成器
+            while stream is None or stream.acquire():
+                try:
+                    res = next(gen)
+                except StopIteration:
+                    break
                 self.send({
                     'cmd': SERVER_RETURN,
                     'reply_id': reply_id,
                     'type': RETURN_GENERATOR,
                     'data': res,
                 })
+            else:  # 客户端已取消
+                gen.close()
+                return
             self.send({
                 'cmd': SERVER_RETURN,
                 'reply_id': reply_id,
@@ -80,8 +161,10 @@ class RpcHandler(socketserver.StreamRequestHandler):
             self.reply_call_exc(reply_id, e)
 
     def handle_call(self, reply_id, key, arg, kwargs):
+        if key == PING_KEY:  # 连接检查, 不经过 call_map
+            return self.reply_call_normal(reply_id, PONG)
         try:
-            res = self.server.call_map[key](*arg, *kwargs)
+            res = self.server.call_map[key](*arg, **kwargs)
         except Exception as e:
             self.reply_call_exc(reply_id, e)
         else:
@@ -89,6 +172,8 @@ class RpcHandler(socketserver.StreamRequestHandler):
                 self.reply_call_gen(reply_id, res)
             else:
                 self.reply_call_normal(reply_id, res)
+        finally:
+            self.streams.pop(reply_id, None)
 
     def _process(self, data):
         cmd = data.get('cmd')
@@ -103,22 +188,64 @@ class RpcHandler(socketserver.StreamRequestHandler):
                 self.subscribed.remove(key)
                 self.server.remove_subscribe(key, self.client_id)
 
-    def process(self, line):
+    def process(self, data):
         try:
-            self._process(json.loads(line))
+            self._process(data)
         except Exception as e:
             self.reply_call_exc(-1, e)
 
+    def negotiate(self, data):
+        # 切换编码的请求需要在读取线程中处理, 回复仍使用旧编码, 之后双方都使用新编码
+        if not (isinstance(data, dict) and data.get('cmd') == CLIENT_CALL and data.get('key') == CODEC_NEGOTIATE_KEY):
+            return False
+        reply_id = data.get('reply_id', -1)
+        try:
+            name, = data.get('args')
+            codec = CODECS[name]
+        except Exception as e:
+            self.reply_call_exc(reply_id, e)
+        else:
+            self.send({'cmd': SERVER_RETURN, 'reply_id': reply_id, 'type': RETURN_NORMAL, 'data': name})
+            self.codec = codec
+        return True
+
+    def flow_control(self, data):
+        # 额度需要在读取线程中按到达顺序处理, 保证先登记再补充
+        if not isinstance(data, dict): return False
+        cmd = data.get('cmd')
+        if cmd == CLIENT_CALL:
+            if (credit := data.get('credit')) is not None:
+                self.streams[data.get('reply_id', -1)] = StreamCredit(credit)
+            return False
+        if cmd == CLIENT_CREDIT:
+            if stream := self.streams.get(data.get('reply_id')):
+                stream.grant(data.get('n', 0))
+            return True
+        if cmd == CLIENT_CANCEL:
+            if stream := self.streams.get(data.get('reply_id')):
+                stream.cancel()
+            return True
+        return False
+
     def handle(self):
         self.server.handlers[self.client_id] = self
         threads = []
         try:
-            for _line in self.rfile:
-                threads.append(t := threading.Thread(target=self.process, args=(_line,)))
+            while True:
+                try:
+                    data = self.codec.read(self.rfile)
+                except ValueError as e:
+                    self.reply_call_exc(-1, e)
+                    continue
+                if data is None: break
+                if self.negotiate(data) or self.flow_control(data): continue
+                threads.append(t := threading.Thread(target=self.process, args=(data,)))
                 t.start()
         except ConnectionError:
             pass
         finally:
+            for stream in list(self.streams.values()):
+                stream.cancel()
             for t in threads: t.join()
             self.server.handlers.pop(self.client_id, None)
 
@@ -185,8 +312,165 @@ async def async_empty_iterator():
     yield
 
 
+_no_item = object()
+
+
+class RpcStream:
+    """
+    生成器调用的结果, 按消费进度向服务端补充额度, 客户端最多缓存 client.stream_credit 项
+    未读完就 close 或被释放时通知服务端取消生成器
+    """
+
+    def __init__(self, client: 'RpcClient', reply_id, evt_list: ResEventList, first_res):
+        self.client = client
+        self.reply_id = reply_id
+        self.evt_list = evt_list
+        self.first = first_res
+        self.credit = client.stream_credit
+        self.refill = max(self.credit // 2, 1) if self.credit else 0
+        self.consumed = 0
+        self.finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.first is not _no_item:
+            res, self.first = self.first, _no_item
+        else:
+            if self.finished: raise StopIteration
+            if self.refill and self.consumed >= self.refill:
+                self.client.grant_stream(self.reply_id, self.consumed)
+                self.consumed = 0
+            reply_type, res = self.evt_list.get()
+            if reply_type != RETURN_GENERATOR:
+                self.finished = True
+                self.client.reply_map.pop(self.reply_id, None)
+                if reply_type == RETURN_EXCEPTION: raise set_exc(res)
+                raise StopIteration
+        self.consumed += 1
+        return res
+
+    def close(self):
+        if self.finished: return
+        self.finished = True
+        self.first = _no_item
+        self.client.reply_map.pop(self.reply_id, None)
+        if self.credit and self.client.is_connected.is_set():
+            try:
+                self.client.cancel_stream(self.reply_id)
+            except OSError:
+                pass
+
+    def __del__(self):
+        if not self.finished:
+            # 可能在任意线程的垃圾回收中触发, 不在此处直接写入
+            try:
+                threading.Thread(target=self.close, daemon=True).start()
+            except RuntimeError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class RpcFuture(concurrent.futures.Future):
+    """批量调用的结果, 生成器调用的结果为迭代器"""
+
+    def __init__(self, client: 'RpcClient', reply_id):
+        super().__init__()
+        self.client = client
+        self.reply_id = reply_id
+
+    def put(self, reply):
+        # 由读取线程调用, 只接收第一个回复, 之后的生成器结果交给 res_iterator
+        reply_type, res = reply
+        if reply_type == RETURN_GENERATOR:
+            self.client.reply_map[self.reply_id] = evt_list = ResEventList()
+            self.set_result(self.client.res_iterator(self.reply_id, evt_list, res))
+            return
+        self.client.reply_map.pop(self.reply_id, None)
+        if reply_type == RETURN_NORMAL:
+            self.set_result(res)
+        elif reply_type == RETURN_EXCEPTION:
+            self.set_exception(set_exc(res))
+        elif reply_type == RETURN_GENERATOR_END:
+            self.set_result(empty_iterator())
+
+
+class RpcBatch:
+    """
+    收集多个调用, 退出时一次写入, 调用立即返回 RpcFuture
+    with client.batch() as b:
+        hp, pos = b.rpc.get_hp(), b.rpc.get_pos()
+    print(hp.result(), pos.result())
+    """
+
+    def __init__(self, client: 'RpcClient'):
+        self.client = client
+        self.buffer = bytearray()
+        self.futures: typing.List[RpcFuture] = []
+
+        class Rpc:
+            def __getattr__(_self, item):
+                def func(*_args, **_kwargs):
+                    return self.call(item, _args, _kwargs)
+
+                func.__name__ = item
+                return func
+
+        self.rpc = Rpc()
+
+    def call(self, key, args=(), kwargs=None) -> RpcFuture:
+        client = self.client
+        reply_id = client.counter.get()
+        self.buffer += client.codec.dumps(client.call_data(reply_id, key, args, kwargs or {}))
+        client.reply_map[reply_id] = fut = RpcFuture(client, reply_id)
+        self.futures.append(fut)
+        return fut
+
+    def discard(self):
+        for fut in self.futures:
+            self.client.reply_map.pop(fut.reply_id, None)
+            fut.cancel()
+        self.futures.clear()
+        self.buffer.clear()
+
+    def flush(self):
+        if not self.buffer: return
+        buf, self.buffer = self.buffer, bytearray()
+        futures, self.futures = self.futures, []
+        try:
+            self.client.write(buf)
+        except BaseException as e:
+            for fut in futures:
+                self.client.reply_map.pop(fut.reply_id, None)
+                fut.set_exception(e)
+            raise
+
+    def __enter__(self):
+        if not self.client.is_connected.is_set():
+            self.client.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.flush()
+        else:
+            self.discard()
+
+
 class RpcClient(object):
-    def __init__(self, address, retry=0, sleep_delay=1, on_end=None):
+    """
+    codec: 连接后尝试切换到的编码 (json / binary), 服务端不支持时继续使用 json
+    stream_credit: 生成器调用的流控额度, 服务端最多领先客户端消费进度这么多项, 0 为不限制
+    写入经过 WriteCoalescer 合并, 并关闭 Nagle 算法, 批量调用见 batch / call_many
+    """
+
+    def __init__(self, address, retry=0, sleep_delay=1, on_end=None, codec='json', stream_credit=64):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.start = False
         self.buffer_size = 1024 * 1024
@@ -195,6 +479,8 @@ class RpcClient(object):
         self.subscribe_map = {}
 
         class Rpc:
+            call_many = self.call_many
+
             def __getattr__(_self, item):
                 def func(*_args, **_kwargs):
                     return self.remote_call(item, _args, _kwargs)
@@ -218,11 +504,26 @@ class RpcClient(object):
         self.retry = retry
         self.sleep_delay = sleep_delay
         self.is_connected = threading.Event()
+        self.codec = JsonCodec
+        self.prefer_codec = codec
+        self.stream_credit = stream_credit
+        self._negotiate_id = None
+        self.writer = WriteCoalescer(self.sock.sendall)
+        self.connect_lock = threading.Lock()
 
     def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)  # 唤醒阻塞在 recv 的读取线程
+        except OSError:
+            pass
         self.sock.close()
 
     def connect(self):
+        with self.connect_lock:
+            if not self.is_connected.is_set():
+                self._connect()
+
+    def _connect(self):
         while True:
             try:
                 self.sock.connect(self.address)
@@ -233,34 +534,72 @@ class RpcClient(object):
                 else:
                     raise
             else:
-                self.is_connected.set()
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 self.serve_thread.start()
+                if self.prefer_codec != self.codec.name:
+                    self.negotiate(self.prefer_codec)
+                self.is_connected.set()
                 break
 
+    def negotiate(self, name):
+        self._negotiate_id = reply_id = self.counter.get()
+        self.reply_map[reply_id] = evt_list = ResEventList()
+        self.send_call(reply_id, CODEC_NEGOTIATE_KEY, [name], {})
+        evt_list.get()  # 旧版本服务端会回复异常, 此时保持 json
+        self.reply_map.pop(reply_id, None)
+        return self.codec.name
+
+    def write(self, data):
+        self.writer.write(data)
+
     def send(self, data):
-        self.sock.send(json.dumps(data).encode('utf-8') + b'\n')
+        self.writer.write(self.codec.dumps(data))
+
+    def batch(self):
+        return RpcBatch(self)
+
+    def call_many(self, calls) -> typing.List[RpcFuture]:
+        """
+        一次写入多个调用, calls 中的每项为 key / (key, args) / (key, args, kwargs)
+        """
+        futures = []
+        with self.batch() as b:
+            for call in calls:
+                futures.append(b.call(call) if isinstance(call, str) else b.call(*call))
+        return futures
 
     def serve(self):
         buffer = bytearray()
         try:
             while True:
-                buffer.extend(self.sock.recv(self.buffer_size))
+                if not (chunk := self.sock.recv(self.buffer_size)):
+                    raise ConnectionResetError('rpc connection closed')
+                buffer += chunk
                 while True:
-                    try:
-                        idx = buffer.index(10)
-                    except ValueError:
-                        break
-                    else:
-                        threading.Thread(target=self.process, args=(buffer[:idx],)).start()
-                        buffer = buffer[idx + 1:]
+                    # 协商编码期间逐条解析, 切换编码后剩余的数据用新编码重新解析
+                    messages, consumed = self.codec.split(buffer, None if self._negotiate_id is None else 1)
+                    del buffer[:consumed]
+                    if not messages: break
+                    for data in messages:
+                        if data.get('cmd') == SERVER_RETURN:
+                            # 返回值在读取线程中按顺序分发, 保证生成器的结果有序
+                            if self._negotiate_id is not None and data.get('reply_id') == self._negotiate_id:
+                                self._negotiate_id = None
+                                if data.get('type') == RETURN_NORMAL:
+                                    self.codec = CODECS[data.get('data')]
+                            self.process(data)
+                        else:
+                            threading.Thread(target=self.process, args=(data,)).start()
         except Exception as e:
             if self.on_end:
                 self.on_end(e)
         finally:
             self.is_connected.clear()
+            # 连接断开时唤醒所有等待中的调用
+            for reply_id, l in list(self.reply_map.items()):
+                l.put((RETURN_EXCEPTION, CONNECTION_CLOSED))
 
-    def process(self, line):
-        data = json.loads(line)
+    def process(self, data):
         cmd = data.get('cmd')
         if cmd == SERVER_RETURN:
             if l := self.reply_map.get(data.get('reply_id', -1)):
@@ -297,37 +636,60 @@ class RpcClient(object):
         if not s:
             self._remove_subscribe(key)
 
+    def grant_stream(self, reply_id, n):
+        self.send({
+            'cmd': CLIENT_CREDIT,
+            'reply_id': reply_id,
+            'n': n,
+        })
+
+    def cancel_stream(self, reply_id):
+        self.send({
+            'cmd': CLIENT_CANCEL,
+            'reply_id': reply_id,
+        })
+
     def res_iterator(self, reply_id, evt_list, first_res):
-        try:
-            yield first_res
-            while True:
-                reply_type, res = evt_list.get()
-                if reply_type == RETURN_EXCEPTION: raise set_exc(res)
-                if reply_type == RETURN_GENERATOR_END: break
-                yield res
-        finally:
-            self.reply_map.pop(reply_id, None)
+        return RpcStream(self, reply_id, evt_list, first_res)
 
     async def async_res_iterator(self, reply_id, evt_list, first_res):
+        credit = self.stream_credit
+        refill = max(credit // 2, 1) if credit else 0
+        consumed = 0
+        finished = False
         try:
             yield first_res
+            consumed += 1
             while True:
-                data = await evt_list.get()
-                reply_type = data.get('type')
-                if reply_type == RETURN_EXCEPTION: raise set_exc(data.get('data'))
-                if reply_type == RETURN_GENERATOR_END: break
-                yield data.get('data')
+                if refill and consumed >= refill:
+                    self.grant_stream(reply_id, consumed)
+                    consumed = 0
+                reply_type, res = await evt_list.get()
+                if reply_type != RETURN_GENERATOR:
+                    finished = True
+                    if reply_type == RETURN_EXCEPTION: raise set_exc(res)
+                    break
+                yield res
+                consumed += 1
         finally:
             self.reply_map.pop(reply_id, None)
+            if credit and not finished and self.is_connected.is_set():
+                self.cancel_stream(reply_id)
 
-    def send_call(self, reply_id, key, args, kwargs):
-        self.send({
+    def call_data(self, reply_id, key, args, kwargs):
+        data = {
             'cmd': CLIENT_CALL,
             'reply_id': reply_id,
             'key': key,
             'args': args,
             'kwargs': kwargs,
-        })
+        }
+        if self.stream_credit:
+            data['credit'] = self.stream_credit
+        return data
+
+    def send_call(self, reply_id, key, args, kwargs):
+        self.send(self.call_data(reply_id, key, args, kwargs))
 
     def remote_call(self, key, args, kwargs):
         if not self.is_connected.is_set():
@@ -368,6 +730,136 @@ class RpcClient(object):
             return async_empty_iterator()
 
 
+
+class RpcClientPool:
+    """
+    线程安全的连接池, 保持 size 个 RpcClient, 每个调用发往未完成请求最少的连接
+    断开的连接按 sleep_delay 指数退避 (不超过 max_delay) 重连, 每次连接仍使用 retry / sleep_delay
+    后台线程每 health_interval 秒 ping 空闲连接, health_timeout 内无回复则关闭重连
+    """
+
+    def __init__(self, address, size=4, retry=0, sleep_delay=1, max_delay=30, codec='json', health_interval=5, health_timeout=5, stream_credit=64):
+        self.address = address
+        self.stream_credit = stream_credit
+        self.size = size
+        self.retry = retry
+        self.sleep_delay = sleep_delay
+        self.max_delay = max_delay
+        self.codec = codec
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.lock = threading.Lock()
+        self.clients: typing.List[RpcClient | None] = [None] * size
+        self.fails = [0] * size
+        self.next_try = [0.] * size
+        self.connecting = set()
+        self.closed = threading.Event()
+        self.health_thread = threading.Thread(target=self._health_loop, daemon=True)
+
+        class Rpc:
+            call_many = self.call_many
+
+            def __getattr__(_self, item):
+                def func(*_args, **_kwargs):
+                    return self.remote_call(item, _args, _kwargs)
+
+                func.__name__ = item
+                return func
+
+        self.rpc = Rpc()
+
+    def __enter__(self):
+        self.connect()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def connect(self):
+        if not self.reconnect() and not self.alive_clients():
+            raise ConnectionError(f'can not connect to {self.address}')
+        if self.health_interval and self.health_thread.ident is None:
+            self.health_thread.start()
+
+    def close(self):
+        self.closed.set()
+        with self.lock:
+            clients, self.clients = self.clients, [None] * self.size
+        for c in clients:
+            if c is not None: c.close()
+
+    def alive_clients(self):
+        with self.lock:
+            return [c for c in self.clients if c is not None and c.is_connected.is_set()]
+
+    def reconnect(self):
+        """(重)连所有到达重试时间的断开连接, 返回成功数量"""
+        now = time.monotonic()
+        todo = []
+        with self.lock:
+            for i, c in enumerate(self.clients):
+                if (c is None or not c.is_connected.is_set()) and i not in self.connecting and self.next_try[i] <= now:
+                    self.connecting.add(i)
+                    todo.append(i)
+        count = 0
+        for n, i in enumerate(todo):
+            if old := self.clients[i]: old.close()
+            client = RpcClient(self.address, retry=self.retry, sleep_delay=self.sleep_delay, codec=self.codec, stream_credit=self.stream_credit)
+            try:
+                if self.closed.is_set(): raise ConnectionError('pool closed')
+                client.connect()
+            except OSError:
+                client.close()
+                with self.lock:  # 服务端不可用, 本轮剩余的连接一并退避
+                    for j in todo[n:]:
+                        self.fails[j] += 1
+                        self.next_try[j] = time.monotonic() + min(self.sleep_delay * 2 ** (self.fails[j] - 1), self.max_delay)
+                        self.connecting.discard(j)
+                break
+            with self.lock:
+                self.clients[i] = client
+                self.fails[i] = 0
+                self.connecting.discard(i)
+            count += 1
+        return count
+
+    def check_health(self):
+        for c in self.alive_clients():
+            if c.reply_map: continue  # 有未完成的请求, 由请求本身发现断开
+            try:  # 按时收到回复即视为可用, 旧版本服务端对 __ping__ 回复的异常也算; 断开时读取线程先清除 is_connected 再唤醒调用
+                c.call_many([PING_KEY])[0].exception(self.health_timeout)
+                healthy = c.is_connected.is_set()
+            except (TimeoutError, OSError):
+                healthy = False
+            if not healthy: c.close()
+        self.reconnect()
+
+    def _health_loop(self):
+        while not self.closed.wait(self.health_interval):
+            try:
+                self.check_health()
+            except Exception:
+                pass
+
+    def acquire(self) -> RpcClient:
+        """取得未完成请求最少的连接"""
+        if self.closed.is_set(): raise ConnectionError('pool closed')
+        if not (clients := self.alive_clients()):
+            self.connect()
+            if not (clients := self.alive_clients()):
+                raise ConnectionError(f'can not connect to {self.address}')
+        return min(clients, key=lambda c: len(c.reply_map))
+
+    def remote_call(self, key, args, kwargs):
+        return self.acquire().remote_call(key, args, kwargs)
+
+    def call_many(self, calls) -> typing.List[RpcFuture]:
+        return self.acquire().call_many(calls)
+
+    def batch(self) -> RpcBatch:
+        return self.acquire().batch()
+
+
 REMOTE_TRACE_KEY = '_remote_trace'
 
 
@@ -0,0 +1,562 @@
+import asyncio
+import concurrent.futures
+import functools
+import inspect
+import traceback
+import types
+import typing
+
+from nylib.utils import Counter
+from .tcp_json import (
+    CLIENT_CALL, CLIENT_SUBSCRIBE, CLIENT_UNSUBSCRIBE, CLIENT_CREDIT, CLIENT_CANCEL, SERVER_RETURN, SERVER_EVENT,
+    RETURN_NORMAL, RETURN_EXCEPTION, RETURN_GENERATOR, RETURN_GENERATOR_END,
+    PING_KEY, PONG, CONNECTION_CLOSED, set_exc, async_empty_iterator,
+)
+from .codec import JsonCodec, CODECS, CODEC_NEGOTIATE_KEY
+
+_gen_end = object()
+_no_item = object()
+
+
+def exc_data(exc):
+    return {
+        'type': type(exc).__name__,
+        'str': str(exc),
+        'trace': ''.join(traceback.format_exception(type(exc), exc, exc.__traceback__)),
+    }
+
+
+class AsyncStreamCredit:
+    """asyncio 版本的 tcp_json.StreamCredit"""
+
+    def __init__(self, credit):
+        self.credit = credit
+        self.cancelled = False
+        self.event = asyncio.Event()
+
+    def grant(self, n):
+        self.credit += n
+        self.event.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self.event.set()
+
+    async def acquire(self):
+        while self.credit <= 0 and not self.cancelled:
+            self.event.clear()
+            await self.event.wait()
+        if self.cancelled: return False
+        self.credit -= 1
+        return True
+
+
+class AsyncRpcHandler:
+    """
+    单个连接的处理器, 与 tcp_json.RpcHandler 使用相同的协议
+    每个调用是一个 task, 同步函数放到 server.executor 中执行
+    """
+    server: 'AsyncRpcServer'
+
+    def __init__(self, server, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_id):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.client_id = client_id
+        self.subscribed = set()
+        self.tasks = set()
+        self.streams: typing.Dict[int, AsyncStreamCredit] = {}
+        self.drain_lock = asyncio.Lock()
+        self.codec = JsonCodec
+
+    def send_nowait(self, data):
+        if not self.writer.is_closing():
+            self.writer.write(self.codec.dumps(data))
+
+    async def send(self, data):
+        self.send_nowait(data)
+        async with self.drain_lock:
+            await self.writer.drain()
+
+    def send_event(self, event_id, event):
+        self.send_nowait({
+            'cmd': SERVER_EVENT,
+            'key': event_id,
+            'data': event
+        })
+
+    async def reply_call_normal(self, reply_id, res):
+        await self.send({
+            'cmd': SERVER_RETURN,
+            'reply_id': reply_id,
+            'type': RETURN_NORMAL,
+            'data': res
+        })
+
+    async def reply_call_exc(self, reply_id, exc):
+        await self.send({
+            'cmd': SERVER_RETURN,
+            'reply_id': reply_id,
+            'type': RETURN_EXCEPTION,
+            'data': exc_data(exc),
+        })
+
+    async def reply_call_gen(self, reply_id, gen):
+        loop = asyncio.get_running_loop()
+        stream = self.streams.get(reply_id)
+        is_async = isinstance(gen, types.AsyncGeneratorType)
+        try:
+            # 有额度限制时先取得额度再推进生成器, 同步生成器逐项放到线程池中推进
+            while stream is None or await stream.acquire():
+                if is_async:
+                    res = await anext(gen, _gen_end)
+                else:
+                    res = await loop.run_in_executor(self.server.executor, next, gen, _gen_end)
+                if res is _gen_end: break
+                await self.send({'cmd': SERVER_RETURN, 'reply_id': reply_id, 'type': RETURN_GENERATOR, 'data': res})
+            else:  # 客户端已取消
+                await gen.aclose() if is_async else gen.close()
+                return
+            await self.send({
+                'cmd': SERVER_RETURN,
+                'reply_id': reply_id,
+                'type': RETURN_GENERATOR_END,
+            })
+        except Exception as e:
+            await self.reply_call_exc(reply_id, e)
+
+    async def handle_call(self, reply_id, key, args, kwargs):
+        if key == PING_KEY:  # 连接检查, 不经过 call_map
+            return await self.reply_call_normal(reply_id, PONG)
+        try:
+            func = self.server.call_map[key]
+            if inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func):
+                res = func(*args, **kwargs)
+            else:
+                res = await asyncio.get_running_loop().run_in_executor(self.server.executor, functools.partial(func, *args, **kwargs))
+            if inspect.isawaitable(res):
+                res = await res
+        except Exception as e:
+            await self.reply_call_exc(reply_id, e)
+        else:
+            if isinstance(res, (types.GeneratorType, types.AsyncGeneratorType)):
+                await self.reply_call_gen(reply_id, res)
+            else:
+                await self.reply_call_normal(reply_id, res)
+        finally:
+            self.streams.pop(reply_id, None)
+
+    def spawn(self, coro):
+        self.tasks.add(task := asyncio.create_task(coro))
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _process(self, data):
+        cmd = data.get('cmd')
+        if cmd == CLIENT_CALL:  # call
+            if (credit := data.get('credit')) is not None:
+                self.streams[data.get('reply_id', -1)] = AsyncStreamCredit(credit)
+            self.spawn(self.handle_call(data.get('reply_id', -1), data.get('key'), data.get('args', []), data.get('kwargs', {})))
+        elif cmd == CLIENT_SUBSCRIBE:  # subscribe
+            if (key := data.get('key')) not in self.subscribed:
+                self.subscribed.add(key)
+                self.server.add_subscribe(key, self.client_id)
+        elif cmd == CLIENT_UNSUBSCRIBE:  # unsubscribe
+            if (key := data.get('key')) in self.subscribed:
+                self.subscribed.remove(key)
+                self.server.remove_subscribe(key, self.client_id)
+        elif cmd == CLIENT_CREDIT:
+            if stream := self.streams.get(data.get('reply_id')):
+                stream.grant(data.get('n', 0))
+        elif cmd == CLIENT_CANCEL:
+            if stream := self.streams.get(data.get('reply_id')):
+                stream.cancel()
+
+    def process(self, data):
+        try:
+            self._process(data)
+        except Exception as e:
+            self.spawn(self.reply_call_exc(-1, e))
+
+    def negotiate(self, data):
+        # 与 RpcHandler.negotiate 相同, 回复使用旧编码, 之后切换
+        if not (isinstance(data, dict) and data.get('cmd') == CLIENT_CALL and data.get('key') == CODEC_NEGOTIATE_KEY):
+            return False
+        reply_id = data.get('reply_id', -1)
+        try:
+            name, = data.get('args')
+            codec = CODECS[name]
+        except Exception as e:
+            self.spawn(self.reply_call_exc(reply_id, e))
+        else:
+            self.send_nowait({'cmd': SERVER_RETURN, 'reply_id': reply_id, 'type': RETURN_NORMAL, 'data': name})
+            self.codec = codec
+        return True
+
+    async def handle(self):
+        self.server.handlers[self.client_id] = self
+        try:
+            while True:
+                try:
+                    data = await self.codec.aread(self.reader)
+                except ValueError as e:
+                    self.spawn(self.reply_call_exc(-1, e))
+                    continue
+                if data is None: break
+                if not self.negotiate(data):
+                    self.process(data)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.server.handlers.pop(self.client_id, None)
+            for key in self.subscribed:
+                self.server.remove_subscribe(key, self.client_id)
+            for task in list(self.tasks):
+                task.cancel()
+            self.writer.close()
+
+
+class AsyncRpcServer:
+    """
+    asyncio 版本的 RpcServer, 协议与 tcp_json.RpcServer 相同, 可与 RpcClient / AsyncRpcClient 互通
+    call_map 中可以是协程函数 / 异步生成器函数, 同步函数在 max_workers 大小的线程池中执行
+    """
+    handlers: typing.Dict[int, AsyncRpcHandler]
+
+    def __init__(self, server_address, call_map, max_workers=None, limit=16 * 1024 * 1024):
+        self.server_address = server_address
+        self.client_counter = Counter()
+        self.subscribe_map = {}
+        self.handlers = {}
+        if isinstance(call_map, (tuple, list,)):
+            call_map = {i.__name__: i for i in call_map}
+        self.call_map = call_map
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix='AsyncRpcServer')
+        self.limit = limit
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.server: asyncio.Server | None = None
+
+    async def on_connect(self, reader, writer):
+        try:
+            await AsyncRpcHandler(self, reader, writer, self.client_counter.get()).handle()
+        except asyncio.CancelledError:  # 关闭事件循环时连接任务被取消
+            pass
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        host, port = self.server_address
+        self.server = await asyncio.start_server(self.on_connect, host, port, limit=self.limit, reuse_address=True)
+        return self.server
+
+    async def serve(self):
+        if self.server is None:
+            await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def close(self):
+        if self.server is not None:
+            self.server.close()
+        for handler in list(self.handlers.values()):
+            handler.writer.close()
+        self.executor.shutdown(wait=False)
+
+    def _in_loop(self, func, *args):
+        # 允许在线程池中的同步函数里推送事件
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self.loop:
+            func(*args)
+        else:
+            self.loop.call_soon_threadsafe(func, *args)
+
+    def _push_event(self, key, event):
+        if s := self.subscribe_map.get(key):
+            for client_id in s.copy():
+                if client := self.handlers.get(client_id):
+                    client.send_event(key, event)
+                else:
+                    s.discard(client_id)
+
+    def push_event(self, key, event):
+        if key not in self.subscribe_map: return
+        self._in_loop(self._push_event, key, event)
+
+    def add_subscribe(self, key, cid):
+        if not (s := self.subscribe_map.get(key)):
+            self.subscribe_map[key] = s = set()
+        s.add(cid)
+
+    def remove_subscribe(self, key, cid):
+        if s := self.subscribe_map.get(key):
+            s.discard(cid)
+            if not s:
+                self.subscribe_map.pop(key, None)
+
+    def _send_all(self, s):
+        for c in list(self.handlers.values()):
+            c.send_nowait(s)
+
+    def send_all(self, s):
+        self._in_loop(self._send_all, s)
+
+
+class AsyncRpcStream:
+    """与 tcp_json.RpcStream 相同的流控, 异步迭代"""
+
+    def __init__(self, client: 'AsyncRpcClient', reply_id, q: asyncio.Queue, first_res):
+        self.client = client
+        self.reply_id = reply_id
+        self.q = q
+        self.first = first_res
+        self.credit = client.stream_credit
+        self.refill = max(self.credit // 2, 1) if self.credit else 0
+        self.consumed = 0
+        self.finished = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.first is not _no_item:
+            res, self.first = self.first, _no_item
+        else:
+            if self.finished: raise StopAsyncIteration
+            if self.refill and self.consumed >= self.refill:
+                self.client.grant_stream(self.reply_id, self.consumed)
+                self.consumed = 0
+            reply_type, res = await self.q.get()
+            if reply_type != RETURN_GENERATOR:
+                self.finished = True
+                self.client.reply_map.pop(self.reply_id, None)
+                if reply_type == RETURN_EXCEPTION: raise set_exc(res)
+                raise StopAsyncIteration
+        self.consumed += 1
+        return res
+
+    def close(self):
+        if self.finished: return
+        self.finished = True
+        self.first = _no_item
+        self.client.reply_map.pop(self.reply_id, None)
+        if self.credit and self.client.is_connected:
+            self.client.cancel_stream(self.reply_id)
+
+    async def aclose(self):
+        self.close()
+
+    def __del__(self):
+        if not self.finished and (loop := self.client.loop) is not None:
+            try:
+                loop.call_soon_threadsafe(self.close)
+            except RuntimeError:  # 事件循环已关闭
+                pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncRpcClient:
+    """
+    asyncio 版本的 RpcClient, 不需要后台线程, 所有回复在事件循环中分发
+    rpc / async_rpc 均返回协程, 生成器调用的结果为 AsyncRpcStream
+    codec: 连接后尝试切换到的编码 (json / binary), 服务端不支持时继续使用 json
+    stream_credit: 生成器调用的流控额度, 0 为不限制
+    """
+
+    def __init__(self, address, retry=0, sleep_delay=1, on_end=None, limit=16 * 1024 * 1024, codec='json', stream_credit=64):
+        self.address = address
+        self.retry = retry
+        self.sleep_delay = sleep_delay
+        self.on_end = on_end
+        self.limit = limit
+        self.counter = Counter()
+        self.reply_map: typing.Dict[int, asyncio.Queue] = {}
+        self.subscribe_map = {}
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+        self.serve_task: asyncio.Task | None = None
+        self.connect_lock = asyncio.Lock()
+        self.drain_lock = asyncio.Lock()
+        self.codec = JsonCodec
+        self.prefer_codec = codec
+        self.stream_credit = stream_credit
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self._negotiate_id = None
+
+        class AsyncRpc:
+            def __getattr__(_self, item):
+                def func(*_args, **_kwargs):
+                    return self.remote_call(item, _args, _kwargs)
+
+                func.__name__ = item
+                return func
+
+        self.rpc = self.async_rpc = AsyncRpc()
+
+    @property
+    def is_connected(self):
+        return self.serve_task is not None and not self.serve_task.done()
+
+    async def connect(self):
+        async with self.connect_lock:
+            if self.is_connected: return
+            self.loop = asyncio.get_running_loop()
+            while True:
+                try:
+                    self.reader, self.writer = await asyncio.open_connection(*self.address, limit=self.limit)
+                except OSError:
+                    if self.retry:
+                        self.retry -= 1
+                        await asyncio.sleep(self.sleep_delay)
+                    else:
+                        raise
+                else:
+                    self.codec = JsonCodec
+                    self.serve_task = asyncio.create_task(self.serve())
+                    if self.prefer_codec != self.codec.name:
+                        await self.negotiate(self.prefer_codec)
+                    break
+
+    async def negotiate(self, name):
+        self._negotiate_id = reply_id = self.counter.get()
+        self.reply_map[reply_id] = q = asyncio.Queue()
+        try:
+            await self.send({'cmd': CLIENT_CALL, 'reply_id': reply_id, 'key': CODEC_NEGOTIATE_KEY, 'args': [name], 'kwargs': {}})
+            await q.get()  # 旧版本服务端会回复异常, 此时保持 json
+        finally:
+            self.reply_map.pop(reply_id, None)
+        return self.codec.name
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.serve_task is not None:
+            try:
+                await self.serve_task
+            except asyncio.CancelledError:
+                pass
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def send_nowait(self, data):
+        self.writer.write(self.codec.dumps(data))
+
+    async def send(self, data):
+        self.send_nowait(data)
+        async with self.drain_lock:
+            await self.writer.drain()
+
+    async def serve(self):
+        err = None
+        try:
+            while (data := await self.codec.aread(self.reader)) is not None:
+                self.process(data)
+        except Exception as e:
+            err = e
+        finally:
+            # 连接断开时唤醒所有等待中的调用
+            for q in self.reply_map.values():
+                q.put_nowait((RETURN_EXCEPTION, CONNECTION_CLOSED))
+            if self.on_end:
+                self.on_end(err)
+
+    def process(self, data):
+        cmd = data.get('cmd')
+        if cmd == SERVER_RETURN:
+            if self._negotiate_id is not None and data.get('reply_id') == self._negotiate_id:
+                self._negotiate_id = None
+                if data.get('type') == RETURN_NORMAL:
+                    self.codec = CODECS[data.get('data')]
+            if (q := self.reply_map.get(data.get('reply_id', -1))) is not None:
+                q.put_nowait((data.get('type'), data.get('data')))
+        elif cmd == SERVER_EVENT:
+            if s := self.subscribe_map.get(key := data.get('key'), set()):
+                data = data.get('data')
+                for c in list(s):
+                    if inspect.isawaitable(res := c(key, data)):
+                        asyncio.ensure_future(res)
+            else:
+                self._remove_subscribe(key)
+
+    def _remove_subscribe(self, key):
+        self.subscribe_map.pop(key, None)
+        self.send_nowait({
+            'cmd': CLIENT_UNSUBSCRIBE,
+            'key': key,
+        })
+
+    async def subscribe(self, key, call):
+        if not self.is_connected:
+            await self.connect()
+        if key not in self.subscribe_map:
+            self.subscribe_map[key] = set()
+            await self.send({
+                'cmd': CLIENT_SUBSCRIBE,
+                'key': key,
+            })
+        self.subscribe_map[key].add(call)
+
+    async def unsubscribe(self, key, call):
+        s = self.subscribe_map.get(key, set())
+        s.discard(call)
+        if not s and key in self.subscribe_map:
+            self._remove_subscribe(key)
+            async with self.drain_lock:
+                await self.writer.drain()
+
+    def grant_stream(self, reply_id, n):
+        self.send_nowait({
+            'cmd': CLIENT_CREDIT,
+            'reply_id': reply_id,
+            'n': n,
+        })
+
+    def cancel_stream(self, reply_id):
+        self.send_nowait({
+            'cmd': CLIENT_CANCEL,
+            'reply_id': reply_id,
+        })
+
+    def res_iterator(self, reply_id, q, first_res):
+        return AsyncRpcStream(self, reply_id, q, first_res)
+
+    async def remote_call(self, key, args, kwargs):
+        if not self.is_connected:
+            await self.connect()
+        reply_id = self.counter.get()
+        self.reply_map[reply_id] = q = asyncio.Queue()
+        data = {
+            'cmd': CLIENT_CALL,
+            'reply_id': reply_id,
+            'key': key,
+            'args': args,
+            'kwargs': kwargs,
+        }
+        if self.stream_credit:
+            data['credit'] = self.stream_credit
+        try:
+            await self.send(data)
+            reply_type, res = await q.get()
+        except BaseException:
+            self.reply_map.pop(reply_id, None)
+            raise
+        if reply_type == RETURN_GENERATOR:  # generator
+            return self.res_iterator(reply_id, q, res)
+        self.reply_map.pop(reply_id, None)
+        if reply_type == RETURN_NORMAL:  # normal
+            return res
+        if reply_type == RETURN_EXCEPTION:  # exc
+            raise set_exc(res)
+        if reply_type == RETURN_GENERATOR_END:  # end of generator
+            return async_empty_iterator()
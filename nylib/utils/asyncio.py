@@ -47,15 +47,18 @@ class AsyncResEvent(asyncio.Event, typing.Generic[_T]):
         self.is_exc = False
         self._loop = loop or asyncio.get_event_loop()
         self.is_waiting = False
+        self.filled = False  # 跨线程 set 时 is_set 要等事件循环处理后才为真
 
     def set(self, data: _T = None) -> None:
-        assert not self.is_set()
+        assert not self.filled
+        self.filled = True
         self.res = data
         self.is_exc = False
         self._loop.call_soon_threadsafe(super().set)
 
     def set_exception(self, exc) -> None:
-        assert not self.is_set()
+        assert not self.filled
+        self.filled = True
         self.res = exc
         self.is_exc = True
         self._loop.call_soon_threadsafe(super().set)
@@ -74,17 +77,18 @@ class AsyncResEvent(asyncio.Event, typing.Generic[_T]):
 
 class AsyncEvtList:
 
-    def __init__(self):
-        self.queue = [AsyncResEvent()]
+    def __init__(self, loop=None):
+        self.loop = loop or asyncio.get_event_loop()  # put 可能在其他线程调用
+        self.queue = [AsyncResEvent(self.loop)]
 
     def put(self, data):
-        if not self.queue or self.queue[-1].is_set():
-            self.queue.append(AsyncResEvent())
+        if not self.queue or self.queue[-1].filled:
+            self.queue.append(AsyncResEvent(self.loop))
         self.queue[-1].set(data)
 
     async def get(self):
         if not self.queue:
-            self.queue.append(AsyncResEvent())
+            self.queue.append(AsyncResEvent(self.loop))
         evt = self.queue[0]
         res = await evt.wait()
         if self.queue and self.queue[0] is evt:
@@ -270,6 +270,62 @@ class LRU(collections.OrderedDict[_T, _T2]):
             self.__setitem(key, value)
 
 
+class SizedLRU(typing.Generic[_T, _T2]):
+    """
+    以 value 总大小（默认 len）为上限的 LRU，单个超过上限的 value 不缓存
+    """
+
+    def __init__(self, max_size: int, _sizeof: typing.Callable[[_T2], int] = len, _threadsafe=False):
+        self.max_size = max_size
+        self.size = 0
+        self.__sizeof = _sizeof
+        self.__data: collections.OrderedDict[_T, tuple[_T2, int]] = collections.OrderedDict()
+        self.__lock = (threading.Lock if _threadsafe else contextlib.nullcontext)()
+
+    def __len__(self):
+        return len(self.__data)
+
+    def __contains__(self, key):
+        return key in self.__data
+
+    def __getitem__(self, key) -> _T2:
+        with self.__lock:
+            value, _ = self.__data[key]
+            self.__data.move_to_end(key)
+            return value
+
+    def get(self, key, default=None) -> _T2:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __setitem__(self, key, value: _T2):
+        size = self.__sizeof(value)
+        with self.__lock:
+            self.__pop(key)
+            if size > self.max_size: return
+            self.__data[key] = value, size
+            self.size += size
+            while self.size > self.max_size:
+                _, (_, size) = self.__data.popitem(last=False)
+                self.size -= size
+
+    def __pop(self, key):
+        if (item := self.__data.pop(key, None)) is not None:
+            self.size -= item[1]
+        return item
+
+    def pop(self, key, default=None) -> _T2:
+        with self.__lock:
+            return default if (item := self.__pop(key)) is None else item[0]
+
+    def clear(self):
+        with self.__lock:
+            self.__data.clear()
+            self.size = 0
+
+
 def exec_ret(script, globals=None, locals=None, *, filename="<string>"):
     '''Execute a script and return the value of the last expression'''
     stmts = list(ast.iter_child_nodes(ast.parse(script)))
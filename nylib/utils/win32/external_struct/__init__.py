@@ -1,15 +1,60 @@
 import ctypes.wintypes
+import struct
 import typing
 
 import glm
 
 from .. import memory, process
 from ..exception import WinAPIError
+from ....driver import DriverBase
 
 _addr_size = ctypes.sizeof(ctypes.c_void_p)
 _T = typing.TypeVar('_T')
 
 
+# handle 可以是进程句柄，也可以是 DriverBase（如 driver.page_cache.PageCacheDriver）
+
+def _read_memory(handle, _type, address):
+    if isinstance(handle, DriverBase): return handle.read(_type, address)
+    return memory.read_memory(handle, _type, address)
+
+
+def _read_bytes(handle, address, size):
+    if isinstance(handle, DriverBase): return handle.read_bytes(address, size)
+    return memory.read_bytes(handle, address, size)
+
+
+def _write_bytes(handle, address, data):
+    if isinstance(handle, DriverBase): return handle.write_bytes(address, data)
+    return memory.write_bytes(handle, address, data)
+
+
+def _read_bytes_zero_trim(handle, address, max_length=None):
+    if not isinstance(handle, DriverBase): return memory.read_bytes_zero_trim(handle, address, max_length)
+    if max_length is not None:
+        res = handle.read_bytes(address, max_length)
+        return res[:sep] if (sep := res.find(0)) >= 0 else res
+    # 长度未知时逐页读取，遇到 0 即停止
+    res = bytearray()
+    while True:
+        chunk = handle.read_bytes(address, handle.page_size - address % handle.page_size)
+        if (sep := chunk.find(0)) >= 0:
+            res += chunk[:sep]
+            return res
+        res += chunk
+        address += len(chunk)
+
+
+def _read_address(handle, address):
+    if isinstance(handle, DriverBase): return handle.read(ctypes.c_size_t, address).value
+    return memory.read_address(handle, address)
+
+
+def _write_address(handle, address, value):
+    if isinstance(handle, DriverBase): return handle.write(address, ctypes.c_size_t(value))
+    return memory.write_address(handle, address, value)
+
+
 def _setdefault(obj, key, default):
     if key in obj.__dict__:
         return obj.__dict__[key]
@@ -17,12 +62,13 @@ def _setdefault(obj, key, default):
     return default
 
 
-def _iter_obj_properties(owner, k):
+def _iter_obj_properties(owner, key):
     yield_names = set()
-    for k, v in (cls_.__dict__[k].items() for cls_ in owner.__mro__ if k in cls_.__dict__):
-        if k in yield_names: continue
-        yield_names.add(k)
-        yield k, v
+    for cls_ in owner.__mro__:
+        for k, v in cls_.__dict__.get(key, {}).items():
+            if k in yield_names: continue
+            yield_names.add(k)
+            yield k, v
 
 
 class ExternalStruct:
@@ -33,6 +79,106 @@ class ExternalStruct:
     def __repr__(self):
         return f'<{self.__class__.__name__} {self.handle}-{self.address:#x}>'
 
+    def snapshot(self) -> 'StructSnapshot | None':
+        """
+        一次读取结构体所有已登记字段覆盖的范围，返回只读的本地快照，空指针返回 None
+        """
+        if not self.address: return None
+        layout = StructLayout.of(type(self))
+        if layout.start >= layout.end: return StructSnapshot(self, layout, b'')
+        return StructSnapshot(self, layout, _read_bytes(self.handle, self.address + layout.start, layout.end - layout.start))
+
+    @classmethod
+    def snapshot_many(cls, handle, addresses: typing.Iterable[int]) -> 'list[StructSnapshot | None]':
+        """
+        批量快照，handle 为 DriverBase 时以 read_scatter 合并读取；空指针或读取失败为 None
+        """
+        layout = StructLayout.of(cls)
+        addresses = list(addresses)
+        size = layout.end - layout.start
+        if isinstance(handle, DriverBase):
+            datas = handle.read_scatter([(a + layout.start, size) for a in addresses])
+        else:
+            datas = []
+            for a in addresses:
+                try:
+                    datas.append(memory.read_bytes(handle, a + layout.start, size) if a else None)
+                except WinAPIError:
+                    datas.append(None)
+        return [StructSnapshot(cls(handle, a), layout, data) if a and data is not None else None for a, data in zip(addresses, datas)]
+
+
+class StructLayout:
+    """
+    ExternalStruct 子类的快照布局：各字段相对结构体的偏移和预编译的解码方式，按 offsets 的取值缓存
+    """
+
+    def __init__(self, owner: typing.Type[ExternalStruct]):
+        self.fields = {}  # 名称 -> (偏移, 解码函数(data, off))
+        for name, p in direct_mem_property.obj_properties(owner):
+            if p.is_static: continue
+            self.fields[name] = getattr(p.owner.offsets, p.offset_key), ctypes.sizeof(p.type), self._direct_decoder(p.type)
+        for name, p in glm_mem_property.obj_properties(owner):
+            if p.is_static: continue
+            self.fields[name] = getattr(p.owner.offsets, p.offset_key), p.size, lambda data, off, t=p.t, size=p.size: t.from_bytes(bytes(data[off:off + size]))
+        for name, p in bit_field_property.obj_properties(owner):
+            self.fields[name] = p.byte_off, p.data_size // 8, \
+                lambda data, off, n=p.data_size // 8, bit_off=p.bit_off, mask=p.mask: (int.from_bytes(data[off:off + n], 'little') >> bit_off) & mask
+        self.start = min((off for off, _, _ in self.fields.values()), default=0)
+        self.end = max((off + size for off, size, _ in self.fields.values()), default=0)
+
+    @staticmethod
+    def _direct_decoder(_type):
+        if isinstance(fmt := getattr(_type, '_type_', None), str) and issubclass(_type, ctypes._SimpleCData):
+            try:
+                s = struct.Struct(fmt)
+            except struct.error:
+                pass
+            else:
+                return lambda data, off: s.unpack_from(data, off)[0]
+        return lambda data, off: _type.from_buffer_copy(data, off).value
+
+    @staticmethod
+    def _offsets_key(owner):
+        return tuple(
+            getattr(p.owner.offsets, p.offset_key)
+            for prop_cls in (direct_mem_property, glm_mem_property)
+            for _, p in prop_cls.obj_properties(owner) if not p.is_static
+        )
+
+    @classmethod
+    def of(cls, owner: typing.Type[ExternalStruct]) -> 'StructLayout':
+        # offsets 可能在运行时被改写（如特征码扫描后赋值），以当前取值为键
+        cache = _setdefault(owner, '__snapshot_layout__', {})
+        if (layout := cache.get(key := cls._offsets_key(owner))) is None:
+            cache[key] = layout = cls(owner)
+        return layout
+
+
+class StructSnapshot:
+    """
+    ExternalStruct 的只读快照，已登记的字段从本地数据解码，其他属性转交原对象
+    """
+    __slots__ = ('_struct', '_layout', '_data', '_base')
+
+    def __init__(self, _struct: ExternalStruct, layout: StructLayout, data):
+        object.__setattr__(self, '_struct', _struct)
+        object.__setattr__(self, '_layout', layout)
+        object.__setattr__(self, '_data', data)
+        object.__setattr__(self, '_base', layout.start)
+
+    def __getattr__(self, name):
+        if (field := self._layout.fields.get(name)) is None:
+            return getattr(self._struct, name)
+        off, _, decode = field
+        return decode(self._data, off - self._base)
+
+    def __setattr__(self, key, value):
+        raise AttributeError('snapshot is read-only')
+
+    def __repr__(self):
+        return f'<snapshot of {self._struct!r}>'
+
 
 class bit_field_property:
     k = '__bit_field_property__'
@@ -51,12 +197,16 @@ class bit_field_property:
         _setdefault(owner, self.k, {})[name] = self
 
     def get_instance_value(self, instance):
+        if isinstance(instance.handle, DriverBase):
+            return int.from_bytes(instance.handle.read_bytes(instance.address + self.byte_off, self.data_size // 8), 'little')
         return getattr(memory, 'read_uint' + str(self.data_size))(instance.handle, instance.address + self.byte_off)
 
     def __get__(self, instance, owner):
         return (self.get_instance_value(instance) >> self.bit_off) & self.mask
 
     def set_instance_value(self, instance, value):
+        if isinstance(instance.handle, DriverBase):
+            return instance.handle.write_bytes(instance.address + self.byte_off, value.to_bytes(self.data_size // 8, 'little'))
         getattr(memory, 'write_uint' + str(self.data_size))(instance.handle, instance.address + self.byte_off, value)
 
     def __set__(self, instance, value):
@@ -93,12 +243,12 @@ class glm_mem_property(typing.Generic[_T]):
         addr = 0
         if not self.is_static and not (addr := instance.address):
             return self.default
-        return self.t.from_bytes(bytes(memory.read_bytes(instance.handle, addr + getattr(self.owner.offsets, self.offset_key), self.size)))
+        return self.t.from_bytes(bytes(_read_bytes(instance.handle, addr + getattr(self.owner.offsets, self.offset_key), self.size)))
 
     def __set__(self, instance, value: _T):
         addr = 0
         if not self.is_static and not (addr := instance.address): return
-        return memory.write_bytes(instance.handle, addr + getattr(self.owner.offsets, self.offset_key), value.to_bytes())
+        return _write_bytes(instance.handle, addr + getattr(self.owner.offsets, self.offset_key), value.to_bytes())
 
 
 class direct_mem_property:
@@ -127,10 +277,10 @@ class direct_mem_property:
         addr = 0
         if not self.is_static and not (addr := instance.address): return self.default
         try:
-            return memory.read_memory(
+            return _read_memory(
                 instance.handle, self.type,
                 addr + getattr(self.owner.offsets, self.offset_key)).value
-        except WinAPIError:
+        except (WinAPIError, OSError):
             return self.default
 
     def __set__(self, instance, value):
@@ -138,7 +288,7 @@ class direct_mem_property:
         addr = 0
         if not self.is_static and not (addr := instance.address): return
         try:
-            return memory.write_bytes(instance.handle, addr + getattr(self.owner.offsets, self.offset_key), bytearray(self.type(value)))
+            return _write_bytes(instance.handle, addr + getattr(self.owner.offsets, self.offset_key), bytearray(self.type(value)))
         except Exception:
             return
 
@@ -176,7 +326,7 @@ class struct_mem_property(typing.Generic[_T]):
         addr = 0
         if not self.is_static and not (addr := instance.address): return None
         addr += getattr(self.owner.offsets, self.offset_key)
-        if self.is_pointer and not (addr := memory.read_address(instance.handle, addr)):
+        if self.is_pointer and not (addr := _read_address(instance.handle, addr)):
             return None
         a1 = getattr(instance, self.pass_self) if isinstance(self.pass_self, str) else instance if self.pass_self else instance.handle
         res = self.type(a1, addr)
@@ -191,7 +341,7 @@ class struct_mem_property(typing.Generic[_T]):
         if not self.is_static and not (addr := instance.address): return
         addr += getattr(self.owner.offsets, self.offset_key)
         if self.is_pointer:
-            memory.write_address(instance.handle, addr, value.address)
+            _write_address(instance.handle, addr, value.address)
         else:
             raise TypeError('cannot set value to a non-pointer struct')
             # ny_mem.write_bytes(instance.handle, addr, value)
@@ -283,5 +433,5 @@ class VirtualFunction(ClassFunction):
             self._vt_offset = self.vt_offset_getter() if callable(self.vt_offset_getter) else self.vt_offset_getter
             delattr(self, 'vt_offset_getter')
         handle = instance.handle
-        vtbl = memory.read_address(handle, instance.address + self._vt_offset)
-        return memory.read_address(handle, vtbl + self._vt_idx * _addr_size)
+        vtbl = _read_address(handle, instance.address + self._vt_offset)
+        return _read_address(handle, vtbl + self._vt_idx * _addr_size)
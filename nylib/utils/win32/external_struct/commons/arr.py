@@ -1,5 +1,8 @@
+import array
 import typing
 
+from . import bulk
+
 _T = typing.TypeVar("_T")
 _T2 = typing.TypeVar("_T2")
 
@@ -31,6 +34,26 @@ class Arr:
                 yield ptr
                 ptr += self._item_size_
 
+    def _bulk_count(self, count):
+        if count is None: count = self._item_count_
+        if count < 0: raise ValueError('count is required for arrays of unknown length')
+        return count
+
+    def read_raw(self, count: int = None) -> bytes | bytearray:
+        """
+        一次读取全部（或前 count 个）元素的数据，长度未知的数组需指定 count
+        """
+        return bulk.read_range(self.handle, self.address, self._bulk_count(count), self._item_size_)
+
+    def as_array(self, typecode: str, count: int = None) -> array.array:
+        return bulk.to_array(self.read_raw(count), typecode, self._item_size_)
+
+    def as_numpy(self, dtype, count: int = None) -> 'bulk.np.ndarray':
+        """
+        :param dtype: numpy dtype（可为结构化 dtype），大小需与元素大小一致
+        """
+        return bulk.to_numpy(self.read_raw(count), dtype, self._item_size_)
+
     def __class_getitem__(cls, item: typing.Tuple[int, int] | int) -> 'type[Arr]':
         if isinstance(item, int):
             item_size = item
@@ -54,6 +77,12 @@ class ItemArr(Arr, typing.Generic[_T]):
         for ptr in super().__iter__():
             yield self._item_type_(self.handle, ptr)
 
+    def snapshots(self, count: int = None) -> 'list[bulk.StructSnapshot]':
+        """
+        一次读取全部（或前 count 个）元素，返回各元素的快照
+        """
+        return bulk.to_snapshots(self._item_type_, self.handle, self.address, self.read_raw(count), self._item_size_)
+
     def __class_getitem__(cls, item: typing.Tuple[typing.Type[_T2], int, int] | typing.Tuple[typing.Type[_T2], int]) -> 'type[ItemArr[_T2]]':
         if len(item) == 3:
             item_type, item_size, item_count = item
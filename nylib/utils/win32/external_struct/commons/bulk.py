@@ -0,0 +1,40 @@
+import array
+import typing
+
+from .. import _read_bytes, ExternalStruct, StructLayout, StructSnapshot
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def read_range(handle, address: int, count: int, item_size: int) -> bytes | bytearray:
+    # 一次读取 count 个元素
+    if count <= 0 or not address: return b''
+    return _read_bytes(handle, address, count * item_size)
+
+
+def to_array(data, typecode: str, item_size: int) -> array.array:
+    res = array.array(typecode)
+    if res.itemsize != item_size:
+        raise ValueError(f'typecode {typecode!r} has size {res.itemsize}, item size is {item_size}')
+    res.frombytes(data)
+    return res
+
+
+def to_numpy(data, dtype, item_size: int) -> 'np.ndarray':
+    if np is None: raise ImportError('numpy is required')
+    if (dtype := np.dtype(dtype)).itemsize != item_size:
+        raise ValueError(f'dtype {dtype} has size {dtype.itemsize}, item size is {item_size}')
+    return np.frombuffer(data, dtype).copy()
+
+
+def to_snapshots(item_type: typing.Type[ExternalStruct], handle, address: int, data, item_size: int) -> list[StructSnapshot]:
+    # 从整段数据切出每个元素的快照，不再访问目标
+    layout = StructLayout.of(item_type)
+    view = memoryview(data)
+    return [
+        StructSnapshot(item_type(handle, address + off), layout, view[off + layout.start:off + layout.end])
+        for off in range(0, len(view), item_size)
+    ]
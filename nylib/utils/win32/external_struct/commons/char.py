@@ -1,6 +1,6 @@
 import typing
 
-from nylib.utils.win32 import memory as ny_mem
+from .. import _read_bytes, _write_bytes, _read_bytes_zero_trim, _read_address, _write_address
 
 
 class CharArr:
@@ -17,11 +17,11 @@ class CharArr:
 
     @property
     def value(self):
-        return ny_mem.read_bytes_zero_trim(self.handle, self.address, self._size_)
+        return _read_bytes_zero_trim(self.handle, self.address, self._size_)
 
     @value.setter
     def value(self, value):
-        ny_mem.write_bytes(self.handle, self.address, value)
+        _write_bytes(self.handle, self.address, value)
 
     @typing.overload
     def __getitem__(self, item: int) -> int:
@@ -33,22 +33,22 @@ class CharArr:
 
     def __getitem__(self, item):
         if isinstance(item, int):
-            return ny_mem.read_uint8(self.handle, self.address + item)
+            return _read_bytes(self.handle, self.address + item, 1)[0]
         elif isinstance(item, slice):
             start = item.start or 0
             stop = item.stop or self._size_
-            return ny_mem.read_bytes(self.handle, self.address + start, stop - start)
+            return _read_bytes(self.handle, self.address + start, stop - start)
         else:
             raise TypeError(f"Unsupported type {type(item)}")
 
     def __setitem__(self, key, value):
         if isinstance(key, int):
-            ny_mem.write_uint8(self.handle, self.address + key, value)
+            _write_bytes(self.handle, self.address + key, bytes((value,)))
         elif isinstance(key, slice):
             start = key.start or 0
             if key.stop is not None:
                 assert len(value) <= key.stop - start, "Value too long"
-            ny_mem.write_bytes(self.handle, self.address + start, value)
+            _write_bytes(self.handle, self.address + start, value)
         else:
             raise TypeError(f"Unsupported type {type(key)}")
 
@@ -59,11 +59,11 @@ class CharArr:
         i = 0
         if hasattr(self, "_size_"):
             while i < self._size_:
-                yield ny_mem.read_uint8(self.handle, self.address + i)
+                yield _read_bytes(self.handle, self.address + i, 1)[0]
                 i += 1
         else:
             while True:
-                yield ny_mem.read_uint8(self.handle, self.address + i)
+                yield _read_bytes(self.handle, self.address + i, 1)[0]
                 i += 1
 
 
@@ -75,15 +75,15 @@ class CharPtr:
 
     @property
     def address_value(self):
-        return ny_mem.read_address(self.handle, self.address)
+        return _read_address(self.handle, self.address)
 
     @address_value.setter
     def address_value(self, value):
-        ny_mem.write_address(self.handle, self.address, value)
+        _write_address(self.handle, self.address, value)
     @property
     def value(self):
         if (addr := self.address_value) == 0: return None
-        return ny_mem.read_bytes_zero_trim(self.handle, addr)
+        return _read_bytes_zero_trim(self.handle, addr)
 
     @value.setter
     def value(self, value):
@@ -108,11 +108,11 @@ class CharPtr:
         addr_value = self.address_value
         if addr_value == 0: raise ValueError("Null pointer")
         if isinstance(item, int):
-            return ny_mem.read_uint8(self.handle, addr_value + item)
+            return _read_bytes(self.handle, addr_value + item, 1)[0]
         elif isinstance(item, slice):
             start = item.start or 0
             assert item.stop is not None and item.stop >= start, "Invalid slice"
-            return ny_mem.read_bytes(self.handle, addr_value + start, item.stop - start)
+            return _read_bytes(self.handle, addr_value + start, item.stop - start)
         else:
             raise TypeError(f"Unsupported type {type(item)}")
 
@@ -120,12 +120,12 @@ class CharPtr:
         addr_value = self.address_value
         if addr_value == 0: raise ValueError("Null pointer")
         if isinstance(key, int):
-            ny_mem.write_uint8(self.handle, addr_value + key, value)
+            _write_bytes(self.handle, addr_value + key, bytes((value,)))
         elif isinstance(key, slice):
             start = key.start or 0
             if key.stop is not None:
                 assert len(value) <= key.stop - start, "Value too long"
-            ny_mem.write_bytes(self.handle, addr_value + start, value)
+            _write_bytes(self.handle, addr_value + start, value)
         else:
             raise TypeError(f"Unsupported type {type(key)}")
 
@@ -134,5 +134,5 @@ class CharPtr:
         if addr_value == 0:
             return
         while True:
-            yield ny_mem.read_uint8(self.handle, addr_value)
+            yield _read_bytes(self.handle, addr_value, 1)[0]
             addr_value += 1
@@ -1,5 +1,6 @@
 import typing
-from nylib.utils.win32 import memory as ny_mem
+
+from .. import _read_address
 
 _T = typing.TypeVar("_T")
 _T2 = typing.TypeVar("_T2")
@@ -15,7 +16,7 @@ class Pointer(typing.Generic[_T]):
 
     @property
     def address(self):
-        return ny_mem.read_address(self.handle, self._address)
+        return _read_address(self.handle, self._address)
 
     def __bool__(self):
         return bool(self.address)
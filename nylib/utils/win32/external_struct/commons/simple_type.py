@@ -1,15 +1,35 @@
+import array
 import ctypes
 import typing
 
-from nylib.utils.win32 import memory as ny_mem
+from .. import _read_memory, _write_bytes, _read_address, _write_address
+from . import bulk
 
 _T = typing.TypeVar("_T")
 _T2 = typing.TypeVar("_T2")
+_ptr_size = ctypes.sizeof(ctypes.c_void_p)
+_ptr_typecode = 'Q' if _ptr_size == 8 else 'I'
+
+
+def _reader(d_type):
+    # handle 可以是进程句柄或 DriverBase
+    def func(handle, address):
+        return _read_memory(handle, d_type, address).value
+
+    return func
+
+
+def _writer(d_type):
+    def func(handle, address, value):
+        _write_bytes(handle, address, bytearray(d_type(value)))
+
+    return func
 
 
 class _SimpleArr(typing.Generic[_T]):
     _item_count_: int
     _item_size_: int
+    _typecode_: str  # array.array 的类型码
     _reader_: typing.Callable[[typing.Any, int], _T]
     _writer_: typing.Callable[[typing.Any, int, _T], None]
 
@@ -37,14 +57,26 @@ class _SimpleArr(typing.Generic[_T]):
 
     def __getitem__(self, idx):
         assert (address := self.address), "Null pointer"
-        if isinstance(idx, int):
-            return self._reader_(self.handle, address + idx * self._item_size_)
+        if isinstance(idx, int):  # 与切片走同一读取路径
+            return bulk.to_array(self.read_raw(idx, idx + 1), self._typecode_, self._item_size_)[0]
         elif isinstance(idx, slice):
-            start, stop = self._simp_slice_(idx)
-            return tuple(self._reader_(self.handle, address + i * self._item_size_) for i in range(start, stop))
+            return tuple(self.as_array(*self._simp_slice_(idx)))
         else:
             raise TypeError(f"Invalid index type: {type(idx)}")
 
+    def read_raw(self, start: int, stop: int) -> bytes | bytearray:
+        assert (address := self.address), "Null pointer"
+        return bulk.read_range(self.handle, address + start * self._item_size_, stop - start, self._item_size_)
+
+    def as_array(self, start: int = 0, stop: int = None) -> array.array:
+        """
+        一次读取 [start, stop) 的元素
+        """
+        return bulk.to_array(self.read_raw(*self._simp_slice_(slice(start, stop))), self._typecode_, self._item_size_)
+
+    def as_numpy(self, start: int = 0, stop: int = None) -> 'bulk.np.ndarray':
+        return bulk.to_numpy(self.read_raw(*self._simp_slice_(slice(start, stop))), self._typecode_, self._item_size_)
+
     def __setitem__(self, key, value):
         assert (address := self.address), "Null pointer"
         if isinstance(key, int):
@@ -57,8 +89,7 @@ class _SimpleArr(typing.Generic[_T]):
     def __iter__(self) -> typing.Generator[_T, None, None]:
         assert (address := self.address), "Null pointer"
         if hasattr(self, '_item_count_'):
-            for i in range(self._item_count_):
-                yield self._reader_(self.handle, address + i * self._item_size_)
+            yield from self.as_array()
         else:
             while True:
                 yield self._reader_(self.handle, address)
@@ -72,8 +103,8 @@ class _SimpleArr(typing.Generic[_T]):
         })
 
 
-def _simple_arr_factory(t_name, reader, writer, item_size, hint_type: typing.Type[_T]) -> 'type[_SimpleArr[_T]]':
-    return type(f'Arr<{t_name}>', (_SimpleArr,), {'_item_size_': item_size, '_reader_': staticmethod(reader), '_writer_': staticmethod(writer)})
+def _simple_arr_factory(t_name, reader, writer, item_size, hint_type: typing.Type[_T], typecode: str) -> 'type[_SimpleArr[_T]]':
+    return type(f'Arr<{t_name}>', (_SimpleArr,), {'_item_size_': item_size, '_typecode_': typecode, '_reader_': staticmethod(reader), '_writer_': staticmethod(writer)})
 
 
 class _SimplePtr(_SimpleArr[_T]):
@@ -84,12 +115,12 @@ class _SimplePtr(_SimpleArr[_T]):
     @property
     def address(self):
         assert (p_address := self.p_address), "Null pointer"
-        return ny_mem.read_address(self.handle, p_address)
+        return _read_address(self.handle, p_address)
 
     @address.setter
     def address(self, value):
         assert (p_address := self.p_address), "Null pointer"
-        ny_mem.write_address(self.handle, p_address, value)
+        _write_address(self.handle, p_address, value)
 
     @property
     def content(self) -> _T:
@@ -100,28 +131,28 @@ class _SimplePtr(_SimpleArr[_T]):
         self[0] = value
 
 
-def _simple_ptr_factory(t_name, reader, writer, item_size, hint_type: typing.Type[_T]) -> 'type[_SimplePtr[_T]]':
-    return type(f'Ptr<{t_name}>', (_SimplePtr,), {'_item_size_': item_size, '_reader_': staticmethod(reader), '_writer_': staticmethod(writer)})
-
-
-int8_arr = _simple_arr_factory('int8', ny_mem.read_int8, ny_mem.write_int8, 1, int)
-int16_arr = _simple_arr_factory('int16', ny_mem.read_int16, ny_mem.write_int16, 2, int)
-int32_arr = _simple_arr_factory('int32', ny_mem.read_int32, ny_mem.write_int32, 4, int)
-int64_arr = _simple_arr_factory('int64', ny_mem.read_int64, ny_mem.write_int64, 8, int)
-uint8_arr = _simple_arr_factory('uint8', ny_mem.read_uint8, ny_mem.write_uint8, 1, int)
-uint16_arr = _simple_arr_factory('uint16', ny_mem.read_uint16, ny_mem.write_uint16, 2, int)
-uint32_arr = _simple_arr_factory('uint32', ny_mem.read_uint32, ny_mem.write_uint32, 4, int)
-uint64_arr = _simple_arr_factory('uint64', ny_mem.read_uint64, ny_mem.write_uint64, 8, int)
-float_arr = _simple_arr_factory('float', ny_mem.read_float, ny_mem.write_float, 4, float)
-ptr_arr = _simple_arr_factory('ptr', ny_mem.read_address, ny_mem.write_address, ctypes.sizeof(ctypes.c_void_p), int)
-
-int8_ptr = _simple_ptr_factory('int8', ny_mem.read_int8, ny_mem.write_int8, 1, int)
-int16_ptr = _simple_ptr_factory('int16', ny_mem.read_int16, ny_mem.write_int16, 2, int)
-int32_ptr = _simple_ptr_factory('int32', ny_mem.read_int32, ny_mem.write_int32, 4, int)
-int64_ptr = _simple_ptr_factory('int64', ny_mem.read_int64, ny_mem.write_int64, 8, int)
-uint8_ptr = _simple_ptr_factory('uint8', ny_mem.read_uint8, ny_mem.write_uint8, 1, int)
-uint16_ptr = _simple_ptr_factory('uint16', ny_mem.read_uint16, ny_mem.write_uint16, 2, int)
-uint32_ptr = _simple_ptr_factory('uint32', ny_mem.read_uint32, ny_mem.write_uint32, 4, int)
-uint64_ptr = _simple_ptr_factory('uint64', ny_mem.read_uint64, ny_mem.write_uint64, 8, int)
-float_ptr = _simple_ptr_factory('float', ny_mem.read_float, ny_mem.write_float, 4, float)
-ptr_ptr = _simple_ptr_factory('ptr', ny_mem.read_address, ny_mem.write_address, ctypes.sizeof(ctypes.c_void_p), int)
+def _simple_ptr_factory(t_name, reader, writer, item_size, hint_type: typing.Type[_T], typecode: str) -> 'type[_SimplePtr[_T]]':
+    return type(f'Ptr<{t_name}>', (_SimplePtr,), {'_item_size_': item_size, '_typecode_': typecode, '_reader_': staticmethod(reader), '_writer_': staticmethod(writer)})
+
+
+int8_arr = _simple_arr_factory('int8', _reader(ctypes.c_int8), _writer(ctypes.c_int8), 1, int, 'b')
+int16_arr = _simple_arr_factory('int16', _reader(ctypes.c_int16), _writer(ctypes.c_int16), 2, int, 'h')
+int32_arr = _simple_arr_factory('int32', _reader(ctypes.c_int32), _writer(ctypes.c_int32), 4, int, 'i')
+int64_arr = _simple_arr_factory('int64', _reader(ctypes.c_int64), _writer(ctypes.c_int64), 8, int, 'q')
+uint8_arr = _simple_arr_factory('uint8', _reader(ctypes.c_uint8), _writer(ctypes.c_uint8), 1, int, 'B')
+uint16_arr = _simple_arr_factory('uint16', _reader(ctypes.c_uint16), _writer(ctypes.c_uint16), 2, int, 'H')
+uint32_arr = _simple_arr_factory('uint32', _reader(ctypes.c_uint32), _writer(ctypes.c_uint32), 4, int, 'I')
+uint64_arr = _simple_arr_factory('uint64', _reader(ctypes.c_uint64), _writer(ctypes.c_uint64), 8, int, 'Q')
+float_arr = _simple_arr_factory('float', _reader(ctypes.c_float), _writer(ctypes.c_float), 4, float, 'f')
+ptr_arr = _simple_arr_factory('ptr', _read_address, _write_address, _ptr_size, int, _ptr_typecode)
+
+int8_ptr = _simple_ptr_factory('int8', _reader(ctypes.c_int8), _writer(ctypes.c_int8), 1, int, 'b')
+int16_ptr = _simple_ptr_factory('int16', _reader(ctypes.c_int16), _writer(ctypes.c_int16), 2, int, 'h')
+int32_ptr = _simple_ptr_factory('int32', _reader(ctypes.c_int32), _writer(ctypes.c_int32), 4, int, 'i')
+int64_ptr = _simple_ptr_factory('int64', _reader(ctypes.c_int64), _writer(ctypes.c_int64), 8, int, 'q')
+uint8_ptr = _simple_ptr_factory('uint8', _reader(ctypes.c_uint8), _writer(ctypes.c_uint8), 1, int, 'B')
+uint16_ptr = _simple_ptr_factory('uint16', _reader(ctypes.c_uint16), _writer(ctypes.c_uint16), 2, int, 'H')
+uint32_ptr = _simple_ptr_factory('uint32', _reader(ctypes.c_uint32), _writer(ctypes.c_uint32), 4, int, 'I')
+uint64_ptr = _simple_ptr_factory('uint64', _reader(ctypes.c_uint64), _writer(ctypes.c_uint64), 8, int, 'Q')
+float_ptr = _simple_ptr_factory('float', _reader(ctypes.c_float), _writer(ctypes.c_float), 4, float, 'f')
+ptr_ptr = _simple_ptr_factory('ptr', _read_address, _write_address, _ptr_size, int, _ptr_typecode)
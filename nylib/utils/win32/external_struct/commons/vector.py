@@ -1,7 +1,9 @@
+import array
 import ctypes
 import typing
 
 from .. import direct_mem_property
+from . import bulk
 
 _T = typing.TypeVar("_T")
 _T2 = typing.TypeVar("_T2")
@@ -36,6 +38,22 @@ class Vector:
             yield ptr
             ptr += self._item_size_
 
+    def read_raw(self) -> bytes | bytearray:
+        """
+        一次读取 [start, finish) 的全部数据
+        """
+        start, finish = self.start, self.finish
+        return bulk.read_range(self.handle, start, (finish - start) // self._item_size_, self._item_size_)
+
+    def as_array(self, typecode: str) -> array.array:
+        return bulk.to_array(self.read_raw(), typecode, self._item_size_)
+
+    def as_numpy(self, dtype) -> 'bulk.np.ndarray':
+        """
+        :param dtype: numpy dtype（可为结构化 dtype），大小需与元素大小一致
+        """
+        return bulk.to_numpy(self.read_raw(), dtype, self._item_size_)
+
     def __class_getitem__(cls, item_size) -> 'type[Vector]':
         assert isinstance(item_size, int) and item_size > 0
         return type(f"Vector<{item_size}>", (Vector,), {"_item_size_": item_size})
@@ -51,6 +69,14 @@ class ItemVector(Vector, typing.Generic[_T]):
         for ptr in super().__iter__():
             yield self._item_type_(self.handle, ptr)
 
+    def snapshots(self) -> 'list[bulk.StructSnapshot]':
+        """
+        一次读取全部元素，返回各元素的快照
+        """
+        start, finish = self.start, self.finish
+        data = bulk.read_range(self.handle, start, (finish - start) // self._item_size_, self._item_size_)
+        return bulk.to_snapshots(self._item_type_, self.handle, start, data, self._item_size_)
+
     def __class_getitem__(cls, item: typing.Tuple[typing.Type[_T2], int]) -> 'type[ItemVector[_T2]]':
         item_type, item_size = item
         assert isinstance(item_size, int) and item_size > 0
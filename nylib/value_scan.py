@@ -0,0 +1,240 @@
+"""
+Cheat Engine 式的数值扫描：首次扫描按值/范围/未知初始值筛选地址，之后以变化、未变、增加、减少等条件继续缩小范围
+
+候选按区域以 numpy 数组保存（区域内偏移 + 上次的值），不为每个地址创建 Python 对象
+"""
+import dataclasses
+import typing
+
+import numpy as np
+
+from .driver import DriverBase
+from .pattern_v2 import MemoryPatternScanner
+
+value_cmps = ('exact', 'range', 'greater', 'less')
+change_cmps = ('changed', 'unchanged', 'increased', 'decreased')
+
+
+@dataclasses.dataclass
+class ValueScanRegion:
+    address: int
+    size: int
+    offsets: np.ndarray | None  # 区域内偏移（升序），None 表示区域内所有对齐位置（未知初始值扫描）
+    values: np.ndarray  # 上次扫描时的值；offsets 为 None 时为整段原始数据（uint8）
+
+    def __len__(self):
+        return len(self.offsets) if self.offsets is not None else 0
+
+
+class ValueScanner:
+    def __init__(
+            self, driver: 'DriverBase | int', dtype='i4', align: int = None,
+            protect: str = 'rw', region_type: str | typing.Iterable[str] = None, modules: typing.Iterable[str] = None,
+            window_size=0x1000000,
+    ):
+        """
+        :param driver: DriverBase，或 win32 进程句柄
+        :param dtype: 数值类型（numpy dtype）
+        :param align: 地址对齐，默认为数值大小
+        :param protect, region_type, modules: 区域过滤，见 MemoryPatternScanner
+        :param window_size: 首次扫描时单次读取的大小
+        """
+        self.planner = MemoryPatternScanner(driver, protect=protect, region_type=region_type, modules=modules)
+        self.driver = self.planner.driver
+        self.dtype = np.dtype(dtype)
+        self.align = align or self.dtype.itemsize
+        step = int(np.lcm(self.dtype.itemsize, self.align))  # 窗口偏移保持对齐
+        self.window_size = max(window_size // step, 1) * step
+        self.regions: list[ValueScanRegion] = []
+        self.scanned = False
+
+    def __len__(self):
+        return sum(len(r) for r in self.regions)
+
+    @property
+    def count(self) -> int:
+        """
+        候选数，未知初始值扫描后为所有对齐位置的数量
+        """
+        return sum(len(r) if r.offsets is not None else self._aligned_count(r.size) for r in self.regions)
+
+    def _aligned_count(self, size: int) -> int:
+        return max(size - self.dtype.itemsize, -1) // self.align + 1
+
+    def _offset_dtype(self, size: int):
+        return np.uint32 if size <= 0xffffffff else np.uint64
+
+    def _compare(self, cmp: str, new: np.ndarray, old: np.ndarray | None, value, value2) -> np.ndarray:
+        if cmp == 'exact': return new == value
+        if cmp == 'range': return (new >= value) & (new <= value2)
+        if cmp == 'greater': return new > value
+        if cmp == 'less': return new < value
+        if cmp == 'changed': return new != old
+        if cmp == 'unchanged': return new == old
+        if cmp == 'increased': return new > old
+        if cmp == 'decreased': return new < old
+        raise ValueError(f'unknown compare {cmp!r}')
+
+    def _aligned_stride(self) -> int:
+        # align 整除 itemsize 时按 itemsize 余数分组连续取值，否则（如 align > itemsize）按 align 跨步取值
+        return self.dtype.itemsize if self.dtype.itemsize % self.align == 0 else self.align
+
+    def _aligned_views(self, data: np.ndarray, stop: int) -> typing.Iterable[tuple[int, np.ndarray]]:
+        # 产出 (首个偏移, 值数组)，数组第 i 项位于 首个偏移 + i * _aligned_stride()，合起来覆盖 [0, stop) 内的所有对齐位置
+        itemsize = self.dtype.itemsize
+        stride = self._aligned_stride()
+        for shift in range(0, stride, self.align):
+            n = min((len(data) - shift - itemsize) // stride + 1, (stop - shift + stride - 1) // stride)
+            if n <= 0: continue
+            if stride == itemsize:
+                yield shift, data[shift:shift + n * itemsize].view(self.dtype)
+            else:
+                yield shift, np.ndarray((n,), self.dtype, data, shift, (stride,))
+
+    def _collect(self, data: np.ndarray, stop: int, mask_of: typing.Callable[[int, np.ndarray], np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+        # 在 data 的对齐位置上按 mask_of(shift, values) 筛选，返回升序的 (偏移, 值)
+        offsets = []
+        values = []
+        stride = self._aligned_stride()
+        for shift, arr in self._aligned_views(data, stop):
+            idx = np.flatnonzero(mask_of(shift, arr))
+            offsets.append(idx * stride + shift)
+            values.append(arr[idx])
+        offsets = np.concatenate(offsets) if offsets else np.zeros(0, np.int64)
+        values = np.concatenate(values) if values else np.zeros(0, self.dtype)
+        if len(offsets) and self.align < stride:
+            order = np.argsort(offsets, kind='stable')
+            offsets, values = offsets[order], values[order]
+        return offsets, values
+
+    def _iter_region_windows(self, address: int, size: int) -> typing.Generator[tuple[int, np.ndarray, int], None, None]:
+        # 产出 (窗口偏移, 窗口数据, stop)，相邻窗口重叠 itemsize - 1 字节，只接受偏移 < stop 的值
+        overlap = self.dtype.itemsize - 1
+        buffer = bytearray(min(self.window_size, size) + overlap)
+        for off in range(0, size, self.window_size):
+            n = min(self.window_size + overlap, size - off)
+            view = memoryview(buffer)[:n]
+            self.driver.read_into(address + off, view)
+            yield off, np.frombuffer(buffer, np.uint8, n), min(self.window_size, n)
+
+    def first_scan(self, cmp='exact', value=None, value2=None) -> int:
+        """
+        :param cmp: exact / range（value <= x <= value2）/ greater / less / unknown（记录所有对齐位置的初始值）
+        :return: 候选数
+        """
+        if cmp != 'unknown' and cmp not in value_cmps: raise ValueError(f'{cmp!r} cannot be used in first scan')
+        value = None if value is None else self.dtype.type(value)
+        value2 = None if value2 is None else self.dtype.type(value2)
+        self.regions = []
+        for address, size in self.planner.plan().regions:
+            if size < self.dtype.itemsize: continue
+            if cmp == 'unknown':
+                try:
+                    data = self.driver.read_bytes(address, size)
+                except Exception:  # 区域可能在枚举后被释放或修改了保护属性
+                    continue
+                self.regions.append(ValueScanRegion(address, size, None, np.frombuffer(data, np.uint8)))
+                continue
+            offsets = []
+            values = []
+            try:
+                for off, data, stop in self._iter_region_windows(address, size):
+                    o, v = self._collect(data, stop, lambda shift, arr: self._compare(cmp, arr, None, value, value2))
+                    offsets.append(o + off)
+                    values.append(v)
+            except Exception:  # 区域可能在枚举后被释放或修改了保护属性
+                continue
+            offsets = np.concatenate(offsets).astype(self._offset_dtype(size))
+            if len(offsets):
+                self.regions.append(ValueScanRegion(address, size, offsets, np.concatenate(values)))
+        self.scanned = True
+        return self.count
+
+    def _read_candidates(self, region: ValueScanRegion) -> tuple[np.ndarray, np.ndarray]:
+        # 返回 (可读的候选掩码, 新值)
+        # 候选密集时整段读取候选覆盖的范围，否则只读取候选所在的页（经 read_scatter 合并为整块读取）
+        page_size = self.driver.page_size
+        itemsize = self.dtype.itemsize
+        offsets = region.offsets.astype(np.int64)
+        first_pages = (region.address + offsets) // page_size
+        last_pages = (region.address + offsets + itemsize - 1) // page_size
+        span_start = int(first_pages[0]) * page_size
+        span_end = (int(last_pages[-1]) + 1) * page_size
+        buf = None
+        if (np.count_nonzero(np.diff(first_pages)) + 1) * 4 >= (span_end - span_start) // page_size:
+            try:
+                buf = np.frombuffer(self.driver.read_bytes(span_start, span_end - span_start), np.uint8)
+            except Exception:  # 范围内有不可读的页
+                pass
+        if buf is not None:
+            ok = np.ones(len(offsets), bool)
+            pos = region.address + offsets - span_start
+        else:
+            pages = np.concatenate((first_pages, last_pages))
+            pages.sort()
+            pages = pages[np.concatenate(([True], pages[1:] != pages[:-1]))]
+            datas = self.driver.read_scatter([(int(p) * page_size, page_size) for p in pages])
+            page_ok = np.fromiter((d is not None for d in datas), bool, len(datas))
+            buf = np.frombuffer(b''.join(bytes(d) if d is not None else bytes(page_size) for d in datas), np.uint8)
+            idx = np.searchsorted(pages, first_pages)
+            ok = page_ok[idx] & page_ok[np.searchsorted(pages, last_pages)]
+            pos = idx * page_size + (region.address + offsets) % page_size
+        if self.align % itemsize == 0:  # 按数值大小对齐时 pos 均为 itemsize 的倍数，直接以整段视图取值
+            new = buf[:len(buf) // itemsize * itemsize].view(self.dtype)[pos // itemsize]
+        else:
+            new = np.ascontiguousarray(buf[pos[:, None] + np.arange(itemsize)]).view(self.dtype).reshape(-1)
+        return ok, new
+
+    def next_scan(self, cmp: str, value=None, value2=None) -> int:
+        """
+        :param cmp: exact / range / greater / less（与给定值比较），changed / unchanged / increased / decreased（与上次的值比较）
+        :return: 候选数
+        """
+        if not self.scanned: raise ValueError('first_scan is required')
+        if cmp not in value_cmps and cmp not in change_cmps: raise ValueError(f'unknown compare {cmp!r}')
+        value = None if value is None else self.dtype.type(value)
+        value2 = None if value2 is None else self.dtype.type(value2)
+        regions = []
+        for region in self.regions:
+            if region.offsets is None:  # 未知初始值：整段读取后在所有对齐位置比较
+                try:
+                    new = np.frombuffer(self.driver.read_bytes(region.address, region.size), np.uint8)
+                except Exception:
+                    continue
+                old_views = dict(self._aligned_views(region.values, region.size))
+                offsets, values = self._collect(new, region.size, lambda shift, arr: self._compare(cmp, arr, old_views[shift], value, value2))
+                offsets = offsets.astype(self._offset_dtype(region.size))
+            elif not len(region.offsets):
+                continue
+            else:
+                ok, new = self._read_candidates(region)
+                mask = ok & self._compare(cmp, new, region.values, value, value2)
+                offsets, values = region.offsets[mask], new[mask]
+            if len(offsets):
+                regions.append(ValueScanRegion(region.address, region.size, offsets, values))
+        self.regions = regions
+        return self.count
+
+    def addresses(self) -> np.ndarray:
+        """
+        所有候选地址（uint64，升序）
+        """
+        return np.concatenate([r.offsets.astype(np.uint64) + np.uint64(r.address) for r in self.regions if r.offsets is not None] or [np.zeros(0, np.uint64)])
+
+    def values(self) -> np.ndarray:
+        """
+        与 addresses() 对应的上次扫描的值
+        """
+        return np.concatenate([r.values for r in self.regions if r.offsets is not None] or [np.zeros(0, self.dtype)])
+
+    def refresh(self) -> np.ndarray:
+        """
+        重新读取所有候选的当前值（不筛选），不可读的候选值为 0
+        """
+        res = []
+        for region in self.regions:
+            if region.offsets is None or not len(region.offsets): continue
+            ok, new = self._read_candidates(region)
+            new[~ok] = 0
+            res.append(new)
+        return np.concatenate(res or [np.zeros(0, self.dtype)])
@@ -0,0 +1,78 @@
+import ctypes
+
+import numpy as np
+import pytest
+
+from nylib.driver import DriverBase, MemoryRegion
+from nylib.value_scan import ValueScanner
+
+
+class BufferDriver(DriverBase):
+    # 以本地 bytearray 模拟目标内存
+    def __init__(self, regions: dict[int, bytearray]):
+        self.regions = regions
+
+    def _locate(self, address, size):
+        for base, buf in self.regions.items():
+            if base <= address and address + size <= base + len(buf):
+                return buf, address - base
+        raise OSError(f'cannot access {address:#x}')
+
+    def read(self, _type, address):
+        buf, off = self._locate(address, ctypes.sizeof(_type))
+        return _type.from_buffer_copy(buf, off)
+
+    def read_bytes(self, address, size):
+        buf, off = self._locate(address, size)
+        return bytes(buf[off:off + size])
+
+    def write(self, address, data):
+        data = bytes(memoryview(data).cast('B'))
+        buf, off = self._locate(address, len(data))
+        buf[off:off + len(data)] = data
+
+    def iter_memory_region(self):
+        return [MemoryRegion(base, len(buf), protect='rw', type='private') for base, buf in self.regions.items()]
+
+    def iter_modules(self):
+        return []
+
+
+def _expected(driver, dtype, align, pred):
+    res = []
+    for base, buf in driver.regions.items():
+        for off in range(0, len(buf) - dtype.itemsize + 1, align):
+            if pred(np.frombuffer(buf, dtype, 1, off)[0]): res.append(base + off)
+    return res
+
+
+@pytest.mark.parametrize('dtype', ['i2', 'i4', 'f8'])
+@pytest.mark.parametrize('align', [1, 2, 3, 4, 8, 16])
+def test_first_and_next_scan_honour_align(dtype, align):
+    dtype = np.dtype(dtype)
+    rng = np.random.default_rng(align)
+    driver = BufferDriver({
+        0x10000: bytearray(rng.integers(0, 3, 0x3000, np.uint8).tobytes()),
+        0x20000: bytearray(rng.integers(0, 3, 0x1000 + 5, np.uint8).tobytes()),
+    })
+    target = dtype.type(np.frombuffer(driver.regions[0x10000], dtype, 1, 0x100)[0])
+    vs = ValueScanner(driver, dtype, align=align, window_size=0x400)
+
+    assert vs.first_scan('exact', target) == len(expected := _expected(driver, dtype, align, lambda v: v == target))
+    assert vs.addresses().tolist() == expected
+    assert (vs.values() == target).all()
+
+    driver.write(0x10000 + 0x100, np.array([target + 1], dtype).tobytes())
+    vs.next_scan('changed')
+    assert vs.addresses().tolist() == [a for a in expected if np.frombuffer(driver.read_bytes(a, dtype.itemsize), dtype)[0] != target]
+
+
+@pytest.mark.parametrize('align', [1, 2, 4, 8, 12])
+def test_unknown_scan_honour_align(align):
+    dtype = np.dtype('i4')
+    driver = BufferDriver({0x10000: bytearray(0x1000)})
+    vs = ValueScanner(driver, dtype, align=align)
+    assert vs.first_scan('unknown') == len(_expected(driver, dtype, align, lambda v: True))
+    driver.write(0x10000 + 0x18, np.array([5], dtype).tobytes())
+    vs.next_scan('increased')
+    assert vs.addresses().tolist() == _expected(driver, dtype, align, lambda v: v > 0)